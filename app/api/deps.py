@@ -3,6 +3,7 @@
 
 所有服务使用单例模式，避免重复初始化
 """
+from functools import lru_cache
 from typing import Generator
 from fastapi import Depends
 from app.services.chat_service import ChatService
@@ -12,19 +13,22 @@ from app.core.security import get_api_key
 
 
 # =============================================
-# 服务依赖（单例模式，由服务类内部管理）
+# 服务依赖（单例模式，lru_cache避免每次请求走单例查找逻辑）
 # =============================================
 
+@lru_cache(maxsize=1)
 def get_memory_service() -> MemoryService:
     """获取记忆服务（单例）"""
     return MemoryService()
 
 
+@lru_cache(maxsize=1)
 def get_chat_service() -> ChatService:
     """获取聊天服务（单例）"""
     return ChatService()
 
 
+@lru_cache(maxsize=1)
 def get_ingest_service() -> IngestService:
     """获取文档摄取服务（单例）"""
     return IngestService()
@@ -3,10 +3,11 @@
 
 提供知识库管理、系统统计和缓存管理功能
 """
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.core.security import get_api_key
 from app.core.logging import logger
-from app.core.cache import cache
+from app.core.cache import cache, LRUCache
 from app.core.config import settings
 from app.utils.llm_factory import get_index, reset_index
 
@@ -19,8 +20,9 @@ async def _clear_milvus_collection(collection_name: str) -> dict:
         from app.utils.vector_store import MilvusManager
         manager = MilvusManager.get_instance()
         
-        if manager.client.has_collection(collection_name):
-            manager.client.drop_collection(collection_name)
+        # SDK调用是同步阻塞的，放到线程池避免阻塞事件循环
+        if await asyncio.to_thread(manager.client.has_collection, collection_name):
+            await asyncio.to_thread(manager.client.drop_collection, collection_name)
             return {"status": "success", "message": f"Milvus collection '{collection_name}' cleared"}
         else:
             return {"status": "info", "message": f"Collection '{collection_name}' does not exist"}
@@ -31,16 +33,11 @@ async def _clear_milvus_collection(collection_name: str) -> dict:
 async def _clear_chroma_collection(collection_name: str) -> dict:
     """清空ChromaDB集合"""
     try:
-        import chromadb
-        persist_dir = settings.CHROMA_PERSIST_DIR
-        
-        try:
-            client = chromadb.PersistentClient(path=persist_dir)
-        except AttributeError:
-            client = chromadb.Client()
-        
+        from app.core.vector_clients import get_chroma_client
+        client = get_chroma_client()
+
         try:
-            client.delete_collection(collection_name)
+            await asyncio.to_thread(client.delete_collection, collection_name)
             return {"status": "success", "message": f"ChromaDB collection '{collection_name}' cleared"}
         except ValueError:
             return {"status": "info", "message": f"Collection '{collection_name}' does not exist"}
@@ -51,12 +48,11 @@ async def _clear_chroma_collection(collection_name: str) -> dict:
 async def _clear_qdrant_collection(collection_name: str) -> dict:
     """清空Qdrant集合"""
     try:
-        from qdrant_client import QdrantClient
-        
-        client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY or None)
-        
-        if client.collection_exists(collection_name):
-            client.delete_collection(collection_name)
+        from app.core.vector_clients import get_qdrant_client
+        client = get_qdrant_client()
+
+        if await asyncio.to_thread(client.collection_exists, collection_name):
+            await asyncio.to_thread(client.delete_collection, collection_name)
             return {"status": "success", "message": f"Qdrant collection '{collection_name}' cleared"}
         else:
             return {"status": "info", "message": f"Collection '{collection_name}' does not exist"}
@@ -96,9 +92,9 @@ async def clear_knowledge_base():
                 detail=f"Unsupported vector store provider: {provider}"
             )
         
-        # 清空相关缓存
-        cache.clear()
-        
+        # 只失效该集合派生的缓存项，保留无关的热缓存（如提供商信息）
+        cache.clear_prefix(f"rag:{collection_name}:")
+
         # 重置索引以便重新初始化
         reset_index()
         
@@ -116,22 +112,48 @@ async def clear_knowledge_base():
         logger.error(f"Error clearing knowledge base: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# /stats 和 /cache/stats 的短TTL缓存 - 吸收仪表盘轮询风暴
+# 轮询间隔通常为1-5秒，数据在此期间几乎不变，无需每次都查询后端
+_STATS_CACHE_TTL = 2  # 秒
+_stats_cache = LRUCache(default_ttl=_STATS_CACHE_TTL, max_size=4)
+_stats_refresh_lock = asyncio.Lock()
+
+
 @router.get("/stats", dependencies=[Depends(get_api_key)])
-async def system_stats():
+async def system_stats(fresh: bool = Query(False, description="强制刷新，跳过短TTL缓存")):
     """
     查看系统详细状态和统计信息
-    
+
     返回所有组件的健康状态和详细统计
-    需要API密钥认证
+    结果带短TTL缓存以吸收轮询压力，需要API密钥认证
     """
+    if not fresh:
+        cached = _stats_cache.get("system_stats")
+        if cached is not None:
+            return cached
+
+    # 锁保证缓存失效时只有一个协程去刷新（抑制惊群）
+    async with _stats_refresh_lock:
+        if not fresh:
+            cached = _stats_cache.get("system_stats")
+            if cached is not None:
+                return cached
+
+        stats = await _build_system_stats()
+        _stats_cache.set("system_stats", stats, ttl=_STATS_CACHE_TTL)
+        return stats
+
+
+async def _build_system_stats() -> dict:
+    """收集所有组件的状态和统计信息"""
     from app.core.connections import RedisConnectionPool
-    from datetime import datetime
-    
+    from app.core.timeutils import utc_now_iso
+
     stats = {
         "status": "healthy",
         "version": "1.1.0",
         "service": settings.PROJECT_NAME,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now_iso(),
         "configuration": {
             "llm_provider": settings.LLM_PROVIDER,
             "llm_model": settings.LLM_MODEL_NAME,
@@ -144,36 +166,42 @@ async def system_stats():
     # 向量数据库统计
     vector_store_name = settings.VECTOR_STORE_PROVIDER.lower()
     collection_name = settings.VECTOR_STORE_COLLECTION
-    
-    try:
-        vector_store_stats = await _get_vector_store_stats(vector_store_name, collection_name)
-        stats["components"]["vector_store"] = vector_store_stats
-        
-        if vector_store_stats.get("status") == "error":
-            stats["status"] = "degraded"
-    except Exception as e:
-        stats["components"]["vector_store"] = {
+
+    async def _redis_stats() -> dict:
+        """并发执行Redis健康检查和信息查询"""
+        redis_healthy, redis_info = await asyncio.gather(
+            RedisConnectionPool.health_check(),
+            RedisConnectionPool.get_info()
+        )
+        return {
+            "status": "connected" if redis_healthy else "unhealthy",
+            **redis_info
+        }
+
+    # 向量数据库和Redis检查相互独立，并发执行使总延迟取决于最慢者
+    vector_store_stats, redis_stats = await asyncio.gather(
+        _get_vector_store_stats(vector_store_name, collection_name),
+        _redis_stats(),
+        return_exceptions=True
+    )
+
+    if isinstance(vector_store_stats, Exception):
+        vector_store_stats = {
             "status": "error",
             "provider": vector_store_name,
-            "error": str(e)
+            "error": str(vector_store_stats)
         }
+    stats["components"]["vector_store"] = vector_store_stats
+    if vector_store_stats.get("status") == "error":
         stats["status"] = "degraded"
-    
-    # Redis 统计
-    try:
-        redis_healthy = await RedisConnectionPool.health_check()
-        redis_info = await RedisConnectionPool.get_info()
-        stats["components"]["redis"] = {
-            "status": "connected" if redis_healthy else "unhealthy",
-            **redis_info
-        }
-        if not redis_healthy:
-            stats["status"] = "degraded"
-    except Exception as e:
-        stats["components"]["redis"] = {
+
+    if isinstance(redis_stats, Exception):
+        redis_stats = {
             "status": "error",
-            "error": str(e)
+            "error": str(redis_stats)
         }
+    stats["components"]["redis"] = redis_stats
+    if redis_stats.get("status") in ("error", "unhealthy"):
         stats["status"] = "degraded"
     
     # 缓存统计
@@ -186,7 +214,7 @@ async def system_stats():
         "enabled": settings.RATE_LIMIT_ENABLED,
         "default_limit": settings.RATE_LIMIT_REQUESTS,
         "window_seconds": settings.RATE_LIMIT_WINDOW,
-        "active_clients": len(rate_limiter._requests)
+        "active_clients": rate_limiter.active_clients()
     }
     
     return stats
@@ -204,8 +232,10 @@ async def _get_vector_store_stats(provider: str, collection_name: str) -> dict:
             from app.utils.vector_store import MilvusManager
             manager = MilvusManager.get_instance()
             
-            if manager.client.has_collection(collection_name):
-                collection_info = manager.client.describe_collection(collection_name)
+            if await asyncio.to_thread(manager.client.has_collection, collection_name):
+                collection_info = await asyncio.to_thread(
+                    manager.client.describe_collection, collection_name
+                )
                 return {
                     "status": "connected",
                     **base_info,
@@ -216,24 +246,24 @@ async def _get_vector_store_stats(provider: str, collection_name: str) -> dict:
                 return {"status": "collection_not_found", **base_info}
         
         elif provider == "chroma":
-            import chromadb
-            client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+            from app.core.vector_clients import get_chroma_client
+            client = get_chroma_client()
             try:
-                collection = client.get_collection(collection_name)
+                collection = await asyncio.to_thread(client.get_collection, collection_name)
                 return {
                     "status": "connected",
                     **base_info,
-                    "count": collection.count()
+                    "count": await asyncio.to_thread(collection.count)
                 }
             except ValueError:
                 return {"status": "collection_not_found", **base_info}
         
         elif provider == "qdrant":
-            from qdrant_client import QdrantClient
-            client = QdrantClient(url=settings.QDRANT_URL)
-            
-            if client.collection_exists(collection_name):
-                info = client.get_collection(collection_name)
+            from app.core.vector_clients import get_qdrant_client
+            client = get_qdrant_client()
+
+            if await asyncio.to_thread(client.collection_exists, collection_name):
+                info = await asyncio.to_thread(client.get_collection, collection_name)
                 return {
                     "status": "connected",
                     **base_info,
@@ -262,8 +292,7 @@ async def clear_cache():
     需要API密钥认证
     """
     try:
-        cleared_count = len(cache._cache) if hasattr(cache, '_cache') else 0
-        cache.clear()
+        cleared_count = cache.clear_and_count()
         logger.info("Cache cleared by admin")
         return {
             "status": "success",
@@ -275,10 +304,17 @@ async def clear_cache():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/cache/stats", dependencies=[Depends(get_api_key)])
-async def cache_stats():
+async def cache_stats(fresh: bool = Query(False, description="强制刷新，跳过短TTL缓存")):
     """
     获取缓存统计信息
-    
-    需要API密钥认证
+
+    结果带短TTL缓存以吸收轮询压力，需要API密钥认证
     """
-    return cache.get_stats()
\ No newline at end of file
+    if not fresh:
+        cached = _stats_cache.get("cache_stats")
+        if cached is not None:
+            return cached
+
+    stats = cache.get_stats()
+    _stats_cache.set("cache_stats", stats, ttl=_STATS_CACHE_TTL)
+    return stats
\ No newline at end of file
@@ -1,22 +1,33 @@
 """
 聊天API端点 - 提供RAG对话能力
 """
-import json
+import anyio
+import orjson
+from anyio.streams.memory import MemoryObjectSendStream
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from fastapi.responses import StreamingResponse, JSONResponse # 引入 JSONResponse
 from app.models.chat import ChatRequest, ChatResponse, SourceNode # 引入响应模型
 from app.services.chat_service import ChatService
+from app.api.deps import get_chat_service
 from app.core.logging import logger, set_request_context
 from app.core.security import validate_query, validate_session_id
 from app.core.exceptions import ValidationException
 
 router = APIRouter()
 
+# SSE响应头常量，避免每个请求重建dict
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"  # 禁用 Nginx 缓冲
+}
 
-def get_chat_service() -> ChatService:
-    """依赖注入：获取ChatService实例"""
-    return ChatService()
+# 预序列化的常量SSE帧 - 错误路径在LLM故障时会成为热路径
+_DONE_FRAME = b"data: [DONE]\n\n"
+_SERVER_ERROR_FRAME = b"data: " + orjson.dumps({
+    "error": "An error occurred while generating the response",
+    "code": "server_error"
+}) + b"\n\n"
 
 
 @router.post("/completions")
@@ -58,10 +69,13 @@ async def chat_endpoint(
             if hasattr(response, 'source_nodes'):
                 for node_with_score in response.source_nodes:
                     node = node_with_score.node
-                    sources.append(SourceNode(
+                    # 优先取原始分块文本，避免get_content()拼接元数据后再丢弃
+                    text = getattr(node, 'text', None) or node.get_content()
+                    # 内部可信数据用model_construct跳过校验开销
+                    sources.append(SourceNode.model_construct(
                         filename=node.metadata.get('file_name', 'unknown'),
                         score=node_with_score.score or 0.0,
-                        text=node.get_content()[:500] # 截取部分文本避免过长
+                        text=text[:500] # 截取部分文本避免过长
                     ))
 
             # 返回 JSON 响应
@@ -75,10 +89,11 @@ async def chat_endpoint(
             raise HTTPException(status_code=500, detail=str(e))
 
     # --- 原有的流式处理逻辑 ---
-    async def event_generator():
+    async def produce(send_stream: MemoryObjectSendStream) -> None:
+        """LLM生产者：将token编码为SSE帧写入有界缓冲"""
         try:
             logger.info(f"Starting chat stream for session {validated_session_id}")
-            
+
             # 获取 Service 的生成器（支持自定义LLM参数）
             stream = service.chat_stream(
                 validated_query,
@@ -87,37 +102,57 @@ async def chat_endpoint(
                 llm_model=req.llm_model,
                 temperature=req.temperature
             )
-            
-            # 转换为 SSE 格式
+
+            # 转换为 SSE 格式（orjson直接输出bytes，避免str→bytes重编码）
             async for token in stream:
                 # SSE 格式: data: content\n\n
-                yield f"data: {json.dumps({'content': token}, ensure_ascii=False)}\n\n"
-            
+                await send_stream.send(b"data: " + orjson.dumps({"content": token}) + b"\n\n")
+
             # 发送完成标记
-            yield "data: [DONE]\n\n"
+            await send_stream.send(_DONE_FRAME)
             logger.info(f"Chat stream completed for session {validated_session_id}")
-            
+
+        except anyio.ClosedResourceError:
+            # 消费端已关闭（客户端断开），正常终止生产
+            pass
         except ValidationException as e:
             logger.warning(f"Validation error in chat stream: {e.message}")
-            error_data = json.dumps({
+            error_data = orjson.dumps({
                 "error": e.message,
                 "code": e.code
-            }, ensure_ascii=False)
-            yield f"data: {error_data}\n\n"
+            })
+            try:
+                await send_stream.send(b"data: " + error_data + b"\n\n")
+            except anyio.ClosedResourceError:
+                pass
         except Exception as e:
             logger.error(f"Error generating response for session {validated_session_id}: {e}", exc_info=True)
-            error_data = json.dumps({
-                "error": "An error occurred while generating the response",
-                "code": "server_error"
-            }, ensure_ascii=False)
-            yield f"data: {error_data}\n\n"
+            try:
+                await send_stream.send(_SERVER_ERROR_FRAME)
+            except anyio.ClosedResourceError:
+                pass
+        finally:
+            await send_stream.aclose()
+
+    async def event_generator():
+        # 有界内存流解耦生产者/消费者：慢客户端不会反压LLM生成，
+        # 客户端断开时取消生产任务，避免浪费LLM调用
+        send_stream, recv_stream = anyio.create_memory_object_stream(max_buffer_size=32)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(produce, send_stream)
+            try:
+                async with recv_stream:
+                    async for frame in recv_stream:
+                        if await request.is_disconnected():
+                            logger.info(f"Client disconnected, aborting stream for session {validated_session_id}")
+                            break
+                        yield frame
+            finally:
+                tg.cancel_scope.cancel()
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # 禁用 Nginx 缓冲
-        }
+        headers=SSE_HEADERS
     )
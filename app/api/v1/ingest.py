@@ -1,10 +1,9 @@
 """
 文档摄取API端点 - 处理文档上传和索引
 """
-import os
-from typing import List, Set
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
 from app.services.ingest_service import IngestService
+from app.api.deps import get_ingest_service
 from app.core.logging import logger
 from app.core.exceptions import ValidationException, AppException
 from app.core.security import get_api_key
@@ -13,17 +12,15 @@ from app.core.config import settings
 router = APIRouter()
 
 # 允许的文件扩展名
-ALLOWED_EXTENSIONS: Set[str] = {".pdf", ".docx", ".txt", ".md", ".csv", ".json", ".html"}
+ALLOWED_EXTENSIONS: frozenset[str] = frozenset({".pdf", ".docx", ".txt", ".md", ".csv", ".json", ".html"})
+
+# 支持的分块模式
+CHUNK_MODES: frozenset[str] = frozenset({"sentence", "semantic"})
 
 # 最大文件大小（字节）
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
 
-def get_ingest_service() -> IngestService:
-    """依赖注入：获取IngestService实例"""
-    return IngestService()
-
-
 async def validate_file(file: UploadFile) -> int:
     """
     验证上传的文件
@@ -40,8 +37,9 @@ async def validate_file(file: UploadFile) -> int:
     if not file.filename:
         raise ValidationException("Filename is empty")
     
-    # 检查文件扩展名
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    # 检查文件扩展名（手动找最后一个点，避免splitext的额外分配）
+    dot = file.filename.rfind(".")
+    file_ext = file.filename[dot:].lower() if dot >= 0 else ""
     if file_ext not in ALLOWED_EXTENSIONS:
         raise ValidationException(
             f"File type '{file_ext}' not allowed. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
@@ -66,17 +64,19 @@ async def validate_file(file: UploadFile) -> int:
             )
         return size
     
-    # 方法3：通过seek获取大小
+    # 方法3：分块流式读取统计大小（超限时立即失败，避免整文件缓冲）
     try:
-        file.file.seek(0, 2)  # 移到文件末尾
-        size = file.file.tell()
-        file.file.seek(0)  # 重置到开头
-        
-        if size > MAX_FILE_SIZE:
-            raise ValidationException(
-                f"File size ({size / 1024 / 1024:.1f}MB) exceeds maximum allowed size ({MAX_FILE_SIZE / 1024 / 1024:.0f}MB)"
-            )
+        size = 0
+        while chunk := await file.read(1 << 20):  # 1MB块
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise ValidationException(
+                    f"File size exceeds maximum allowed size ({MAX_FILE_SIZE / 1024 / 1024:.0f}MB)"
+                )
+        await file.seek(0)  # 重置到开头供后续处理
         return size
+    except ValidationException:
+        raise
     except Exception:
         # 如果无法确定大小，允许上传但记录警告
         logger.warning(f"Could not determine file size for {file.filename}")
@@ -103,7 +103,7 @@ async def upload_document(
         raise HTTPException(status_code=400, detail=e.message)
     
     # 验证分块模式
-    if chunk_mode not in ["sentence", "semantic"]:
+    if chunk_mode not in CHUNK_MODES:
         raise HTTPException(
             status_code=400,
             detail="chunk_mode must be 'sentence' or 'semantic'"
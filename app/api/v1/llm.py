@@ -10,13 +10,18 @@ from app.core.logging import logger
 router = APIRouter()
 
 
+# 预分配的屏蔽字符串，避免每次调用重新分配 "*" * n
+_MASK = "*" * 256
+
+
 def _mask_sensitive(value: str, visible_chars: int = 4) -> str:
     """屏蔽敏感信息"""
     if not value:
         return ""
-    if len(value) <= visible_chars * 2:
-        return "*" * len(value)
-    return value[:visible_chars] + "*" * (len(value) - visible_chars * 2) + value[-visible_chars:]
+    n = len(value)
+    if n <= visible_chars * 2:
+        return _MASK[:n]
+    return value[:visible_chars] + _MASK[:n - visible_chars * 2] + value[-visible_chars:]
 
 
 @router.get("/providers")
@@ -6,6 +6,7 @@ from app.core.security import get_api_key
 from app.core.config import settings
 from app.utils.memory_providers import MemoryProviderFactory
 from app.services.memory_service import MemoryService
+from app.api.deps import get_memory_service
 from app.core.logging import logger
 
 router = APIRouter()
@@ -70,14 +71,16 @@ async def get_provider_info(provider_name: str):
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/session/{session_id}", dependencies=[Depends(get_api_key)])
-async def clear_session_memory(session_id: str):
+async def clear_session_memory(
+    session_id: str,
+    memory_service: MemoryService = Depends(get_memory_service)
+):
     """
     清空指定会话的记忆
-    
+
     需要API密钥认证
     """
     try:
-        memory_service = MemoryService()
         result = await memory_service.clear_memory(session_id)
         
         if result:
@@ -1,75 +1,118 @@
 """
 向量数据库管理API - 查看和管理向量数据库配置
 """
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+from typing import Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from app.core.security import get_api_key
 from app.core.config import settings
 from app.utils.vector_store_providers import VectorStoreProviderFactory
 from app.core.logging import logger
 
-router = APIRouter()
+
+def _etag_of(body: bytes) -> str:
+    """由响应体派生弱ETag（blake2b，8字节摘要足够区分版本）"""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _cached_json_response(body: bytes, etag: str, request: Request) -> Response:
+    """返回预序列化JSON；客户端ETag匹配时直接304省去传输"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+# 本路由全部是配置/诊断类JSON，orjson序列化即便挂到别的应用下也不退化
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# 提供商特定配置的构建表：模块加载时建好，请求路径查表即可，
+# 替代逐个比较provider字符串的if/elif链，新增提供商只需加一项
+_PROVIDER_CONFIG_BUILDERS = {
+    "milvus": lambda s: {
+        "uri": s.MILVUS_URI,
+        "has_token": bool(s.MILVUS_TOKEN)
+    },
+    "chroma": lambda s: {
+        "persist_dir": s.CHROMA_PERSIST_DIR
+    },
+    "pinecone": lambda s: {
+        "index": s.PINECONE_INDEX,
+        "has_api_key": bool(s.PINECONE_API_KEY),
+        "environment": s.PINECONE_ENVIRONMENT
+    },
+    "qdrant": lambda s: {
+        "url": s.QDRANT_URL,
+        "has_api_key": bool(s.QDRANT_API_KEY)
+    },
+}
+
+# /providers 和 /current 的响应在启动后是静态的（提供商列表和settings
+# 都不变），首次请求序列化一次为bytes，之后跳过jsonable_encoder+json.dumps
+_providers_cached: Optional[Tuple[bytes, str]] = None
+_current_config_cached: Optional[Tuple[bytes, str]] = None
+
 
 @router.get("/providers")
-async def list_providers():
+async def list_providers(request: Request):
     """
     列出所有支持的向量数据库提供商
     """
-    providers = VectorStoreProviderFactory.get_supported_providers()
-    provider_info = {}
-    
-    for provider in providers:
-        try:
-            provider_info[provider] = VectorStoreProviderFactory.get_provider_info(provider)
-        except Exception as e:
-            logger.error(f"Error getting info for provider {provider}: {e}")
-            provider_info[provider] = {"error": str(e)}
-    
-    return {
-        "supported_providers": providers,
-        "current_provider": settings.VECTOR_STORE_PROVIDER,
-        "providers": provider_info
-    }
+    global _providers_cached
+    if _providers_cached is None:
+        providers = VectorStoreProviderFactory.get_supported_providers()
+        provider_info = {}
+
+        for provider in providers:
+            try:
+                provider_info[provider] = VectorStoreProviderFactory.get_provider_info(provider)
+            except Exception as e:
+                logger.error(f"Error getting info for provider {provider}: {e}")
+                provider_info[provider] = {"error": str(e)}
+
+        body = orjson.dumps({
+            "supported_providers": providers,
+            "current_provider": settings.VECTOR_STORE_PROVIDER,
+            "providers": provider_info
+        })
+        _providers_cached = (body, _etag_of(body))
+
+    return _cached_json_response(*_providers_cached, request)
 
 @router.get("/current")
-async def get_current_vector_store_config():
+async def get_current_vector_store_config(request: Request):
     """
     获取当前向量数据库配置
     """
-    try:
-        provider_info = VectorStoreProviderFactory.get_provider_info(settings.VECTOR_STORE_PROVIDER)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    config = {
-        "provider": settings.VECTOR_STORE_PROVIDER,
-        "collection": settings.VECTOR_STORE_COLLECTION,
-        "dimension": settings.VECTOR_STORE_DIM,
-        "provider_info": provider_info
-    }
-    
-    # 添加提供商特定的配置
-    if settings.VECTOR_STORE_PROVIDER == "milvus":
-        config["milvus"] = {
-            "uri": settings.MILVUS_URI,
-            "has_token": bool(settings.MILVUS_TOKEN)
-        }
-    elif settings.VECTOR_STORE_PROVIDER == "chroma":
-        config["chroma"] = {
-            "persist_dir": settings.CHROMA_PERSIST_DIR
-        }
-    elif settings.VECTOR_STORE_PROVIDER == "pinecone":
-        config["pinecone"] = {
-            "index": settings.PINECONE_INDEX,
-            "has_api_key": bool(settings.PINECONE_API_KEY),
-            "environment": settings.PINECONE_ENVIRONMENT
-        }
-    elif settings.VECTOR_STORE_PROVIDER == "qdrant":
-        config["qdrant"] = {
-            "url": settings.QDRANT_URL,
-            "has_api_key": bool(settings.QDRANT_API_KEY)
+    global _current_config_cached
+    if _current_config_cached is None:
+        try:
+            provider_info = VectorStoreProviderFactory.get_provider_info(settings.VECTOR_STORE_PROVIDER)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        provider = settings.vector_store_provider_norm
+        config = {
+            "provider": settings.VECTOR_STORE_PROVIDER,
+            "collection": settings.VECTOR_STORE_COLLECTION,
+            "dimension": settings.VECTOR_STORE_DIM,
+            "provider_info": provider_info
         }
-    
-    return config
+
+        # 添加提供商特定的配置（查表分发）
+        builder = _PROVIDER_CONFIG_BUILDERS.get(provider)
+        if builder is not None:
+            config[provider] = builder(settings)
+
+        body = orjson.dumps(config)
+        _current_config_cached = (body, _etag_of(body))
+
+    return _cached_json_response(*_current_config_cached, request)
 
 @router.get("/provider/{provider_name}")
 async def get_provider_info(provider_name: str):
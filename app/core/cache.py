@@ -2,245 +2,496 @@
 LRU缓存实现
 
 提供线程安全的内存缓存，支持TTL过期和LRU淘汰策略
+内部按键哈希分片（striped locking），并发读写互不争抢同一把锁
 生产环境建议使用 Redis 作为缓存后端
 """
+import asyncio
+import heapq
+import itertools
 import time
-from typing import Any, Optional, Dict, Tuple
+from array import array
+from typing import Any, Optional, Dict, List
 from threading import Lock
-from collections import OrderedDict
-from dataclasses import dataclass
 from app.core.config import settings
 from app.core.logging import logger
 
+# TTL计算使用单调时钟：不受NTP跳变影响（墙钟回拨会让time.time()的TTL判断失真），
+# 模块级绑定也省掉属性查找
+_now = time.monotonic
 
-@dataclass
-class CacheEntry:
-    """缓存条目"""
-    value: Any
-    expiry: float
-    created_at: float
-    access_count: int = 0
+
+class _CountMinSketch:
+    """
+    4位饱和计数的Count-Min Sketch，近似记录键的访问频率
+
+    纯LRU对"一次性扫描"型访问有病态行为：大批只会被读一次的键
+    会把真正的热键挤出去。sketch以O(1)内存近似回答"这个键最近
+    被访问了多少次"，供淘汰时做准入判断（TinyLFU）。
+    计数器竞态是良性的：近似计数本就容忍少量丢失更新，无需加锁。
+    """
+    __slots__ = ('_mask', '_depth', '_tables', '_additions', '_sample_size')
+
+    def __init__(self, capacity: int, depth: int = 4):
+        # 表宽取 >= capacity*8 的2的幂，降低哈希冲突导致的高估
+        width = 1
+        while width < capacity * 8:
+            width <<= 1
+        self._mask = width - 1
+        self._depth = depth
+        self._tables = [array('B', bytes(width)) for _ in range(depth)]
+        self._additions = 0
+        # 周期性老化：累计写入达到样本量后所有计数减半，
+        # 让频率估计反映"最近"而不是"有史以来"
+        self._sample_size = capacity * 10
+
+    def _indexes(self, key: str):
+        """双重哈希派生depth个近似独立的槽位"""
+        h1 = hash(key)
+        h2 = (h1 >> 17) | 1  # 保证奇数步长
+        mask = self._mask
+        return [(h1 + i * h2) & mask for i in range(self._depth)]
+
+    def increment(self, key: str) -> None:
+        """记录一次访问（计数在15处饱和）"""
+        for table, idx in zip(self._tables, self._indexes(key)):
+            count = table[idx]
+            if count < 15:
+                table[idx] = count + 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        """估计键的访问频率（取各行最小值以抵消冲突高估）"""
+        return min(
+            table[idx]
+            for table, idx in zip(self._tables, self._indexes(key))
+        )
+
+    def _age(self) -> None:
+        """所有计数减半，淡出历史热度"""
+        for table in self._tables:
+            for i in range(len(table)):
+                table[i] >>= 1
+        self._additions = 0
+
+
+def _peek(counter: "itertools.count") -> int:
+    """读取itertools.count的当前值而不消耗它（经__reduce__取构造参数）"""
+    return counter.__reduce__()[1][0]
+
+
+def _presize_dict(d: Dict, size: int) -> None:
+    """
+    把dict底层哈希表预先撑到能容纳size个条目的容量
+
+    CPython没有公开的预分配API，但插入再删除哨兵键后表不会收缩
+    （删除只留下dummy槽位），后续真实键的插入复用这些槽位，
+    首次灌满缓存时不再出现O(n)的倍增rehash停顿
+    """
+    if size <= 8:
+        return
+    for i in range(size):
+        d[i] = None
+    for i in range(size):
+        del d[i]
+
+
+class _Node:
+    """
+    双向链表节点，缓存条目字段直接内联（哨兵节点key为None）
+
+    带__dict__的dataclass每个实例额外背~100字节的字典开销，
+    一万条目就是上MB的纯浪费；__slots__扁平化后单次set()只分配
+    一个对象，条目更小、局部性更好
+    """
+    __slots__ = ('key', 'value', 'expiry', 'created_at', 'access_count',
+                 'prev', 'next')
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.value: Any = None
+        self.expiry: float = 0.0
+        self.created_at: float = 0.0
+        self.access_count: int = 0
+        self.prev: Optional['_Node'] = None
+        self.next: Optional['_Node'] = None
+
+
+class _Shard:
+    """
+    单个缓存分片：dict索引 + 手写双向链表维护LRU顺序
+
+    OrderedDict.move_to_end每次命中都要跨Python/C边界重链内部链表，
+    是命中路径的主要开销；手写链表的提升操作只是三次指针写，
+    锁持有时间更短
+    """
+    __slots__ = ('lock', 'map', 'head', 'tail', 'expiry_heap')
+
+    def __init__(self):
+        self.lock = Lock()
+        self.map: Dict[str, _Node] = {}
+        # head/tail哨兵：head.next是LRU受害者，tail.prev是最近使用
+        self.head = _Node()
+        self.tail = _Node()
+        self.head.next = self.tail
+        self.tail.prev = self.head
+        # (expiry, key)最小堆：清扫时只需弹出已到期的堆顶，
+        # 不必在锁内整表扫描；被覆盖/删除的键留下的旧堆项是墓碑，
+        # 弹出时核对实际过期时间即可跳过
+        self.expiry_heap: List[tuple] = []
+
+    def unlink(self, node: _Node) -> None:
+        """摘除节点"""
+        node.prev.next = node.next
+        node.next.prev = node.prev
+
+    def push_back(self, node: _Node) -> None:
+        """插入到tail之前（标记为最近使用）"""
+        last = self.tail.prev
+        last.next = node
+        node.prev = last
+        node.next = self.tail
+        self.tail.prev = node
+
+    def reset(self) -> None:
+        """清空分片"""
+        self.map.clear()
+        self.expiry_heap.clear()
+        self.head.next = self.tail
+        self.tail.prev = self.head
 
 
 class LRUCache:
     """
-    带TTL的LRU缓存（线程安全）
-    
+    带TTL的LRU缓存（线程安全、分片）
+
     特性:
     - 支持TTL过期
-    - LRU淘汰策略
+    - LRU淘汰策略（每个分片独立维护）
     - 最大条目数限制
     - 访问计数统计
+
+    单把全局锁会让所有缓存操作在工作线程间串行化；
+    这里按 hash(key) 把键空间切成2的幂个分片，每个分片独立加锁，
+    命中路径只锁住自己的分片，吞吐随核数近线性扩展。
     """
-    
+
     def __init__(
-        self, 
+        self,
         default_ttl: int = 3600,
-        max_size: int = 10000
+        max_size: int = 10000,
+        num_shards: int = 16
     ) -> None:
         """
         初始化缓存
-        
+
         Args:
             default_ttl: 默认过期时间（秒）
-            max_size: 最大缓存条目数
+            max_size: 最大缓存条目数（所有分片合计）
+            num_shards: 分片数量（必须是2的幂）
         """
-        self._cache: OrderedDict[str, CacheEntry] = OrderedDict()
-        self._lock = Lock()
+        if num_shards & (num_shards - 1):
+            raise ValueError("num_shards must be a power of two")
+
         self.default_ttl = default_ttl
         self.max_size = max_size
-        
-        # 统计信息
-        self._hits = 0
-        self._misses = 0
-        self._evictions = 0
-    
+        self._num_shards = num_shards
+        self._shard_mask = num_shards - 1
+        # 每个分片的容量上限（总量均摊，至少为1）
+        self._shard_max_size = max(1, max_size // num_shards)
+
+        self._shards: List[_Shard] = [_Shard() for _ in range(num_shards)]
+        for shard in self._shards:
+            _presize_dict(shard.map, self._shard_max_size)
+
+        # 统计计数器：next(itertools.count())是单条C级原子操作（GIL保护），
+        # 可以在分片锁之外推进，进一步缩短命中路径的临界区
+        self._hit_counter = itertools.count()
+        self._miss_counter = itertools.count()
+        self._eviction_counter = itertools.count()
+        self._admission_reject_counter = itertools.count()
+
+        # TinyLFU准入过滤器：缓存满时，新键只有在估计频率不低于
+        # LRU受害者时才被接纳，避免一次性扫描冲刷热数据
+        self._sketch = _CountMinSketch(max_size)
+
+        # 缓存禁用时直接把set绑定成实例级no-op：
+        # 写路径连每次的标志检查都省掉（启动时部分求值，标志不可变）
+        if not settings.ENABLE_CACHE:
+            self.set = self._set_disabled
+
+    def _shard(self, key: str) -> _Shard:
+        """根据键哈希定位分片"""
+        return self._shards[hash(key) & self._shard_mask]
+
     def get(self, key: str) -> Optional[Any]:
         """
         获取缓存值
-        
+
         如果命中，会更新LRU顺序和访问计数
-        
+
         Args:
             key: 缓存键
-            
+
         Returns:
             缓存值，如果不存在或已过期则返回None
         """
-        with self._lock:
-            if key not in self._cache:
-                self._misses += 1
-                return None
-            
-            entry = self._cache[key]
-            current_time = time.time()
-            
-            # 检查是否过期
-            if current_time > entry.expiry:
-                del self._cache[key]
-                self._misses += 1
-                return None
-            
-            # 更新LRU顺序（移到末尾表示最近使用）
-            self._cache.move_to_end(key)
-            entry.access_count += 1
-            
-            self._hits += 1
-            return entry.value
-    
+        # 锁外读一次时钟，缩短临界区；频率记录和计数同样在锁外
+        now = _now()
+        self._sketch.increment(key)
+        shard = self._shard(key)
+        with shard.lock:
+            node = shard.map.get(key)
+            if node is None:
+                value = None
+                hit = False
+            elif now > node.expiry:
+                # 已过期：摘除
+                shard.unlink(node)
+                del shard.map[key]
+                value = None
+                hit = False
+            else:
+                # 提升为最近使用：三次指针写，无需重建结构
+                shard.unlink(node)
+                shard.push_back(node)
+                node.access_count += 1
+                value = node.value
+                hit = True
+
+        next(self._hit_counter if hit else self._miss_counter)
+        return value
+
     def set(
-        self, 
-        key: str, 
-        value: Any, 
+        self,
+        key: str,
+        value: Any,
         ttl: Optional[int] = None
     ) -> None:
         """
         设置缓存值
-        
+
         Args:
             key: 缓存键
             value: 缓存值
             ttl: 过期时间（秒），None使用默认值
         """
-        if not settings.ENABLE_CACHE:
-            return
-        
         ttl = ttl if ttl is not None else self.default_ttl
-        current_time = time.time()
+        current_time = _now()
         expiry = current_time + ttl
-        
-        with self._lock:
-            # 如果key已存在，更新它
-            if key in self._cache:
-                self._cache[key] = CacheEntry(
-                    value=value,
-                    expiry=expiry,
-                    created_at=current_time
-                )
-                self._cache.move_to_end(key)
+
+        self._sketch.increment(key)
+        shard = self._shard(key)
+        with shard.lock:
+            node = shard.map.get(key)
+
+            # 如果key已存在，原地更新并提升（旧堆项成为墓碑）
+            if node is not None:
+                node.value = value
+                node.expiry = expiry
+                node.created_at = current_time
+                node.access_count = 0
+                shard.unlink(node)
+                shard.push_back(node)
+                heapq.heappush(shard.expiry_heap, (expiry, key))
                 return
-            
-            # 检查是否需要淘汰
-            while len(self._cache) >= self.max_size:
-                # 淘汰最旧的条目（OrderedDict的第一个）
-                evicted_key, _ = self._cache.popitem(last=False)
-                self._evictions += 1
-                logger.debug(f"Cache eviction: {evicted_key}")
-            
+
+            # 分片已满：先做TinyLFU准入判断，再淘汰
+            if len(shard.map) >= self._shard_max_size:
+                victim = shard.head.next
+                # 新键频率低于受害者时拒绝接纳（频率已在上面记录，
+                # 反复出现的键最终会攒够热度被接纳）
+                if self._sketch.estimate(key) < self._sketch.estimate(victim.key):
+                    next(self._admission_reject_counter)
+                    return
+
+                while len(shard.map) >= self._shard_max_size:
+                    victim = shard.head.next
+                    shard.unlink(victim)
+                    del shard.map[victim.key]
+                    next(self._eviction_counter)
+                    logger.debug(f"Cache eviction: {victim.key}")
+
             # 添加新条目
-            self._cache[key] = CacheEntry(
-                value=value,
-                expiry=expiry,
-                created_at=current_time
-            )
-    
+            node = _Node(key)
+            node.value = value
+            node.expiry = expiry
+            node.created_at = current_time
+            shard.map[key] = node
+            shard.push_back(node)
+            heapq.heappush(shard.expiry_heap, (expiry, key))
+
+    def _set_disabled(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """ENABLE_CACHE=false时绑定到实例set上的空操作"""
+        return None
+
     def delete(self, key: str) -> bool:
         """
         删除缓存值
-        
+
         Args:
             key: 缓存键
-            
+
         Returns:
             是否成功删除
         """
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+        shard = self._shard(key)
+        with shard.lock:
+            node = shard.map.pop(key, None)
+            if node is not None:
+                shard.unlink(node)
                 return True
             return False
-    
+
     def clear(self) -> None:
         """清空所有缓存"""
-        with self._lock:
-            self._cache.clear()
-            logger.info("Cache cleared")
-    
+        for shard in self._shards:
+            with shard.lock:
+                shard.reset()
+        logger.info("Cache cleared")
+
+    def clear_and_count(self) -> int:
+        """
+        清空缓存并返回清除的条目数
+
+        Returns:
+            清除前的条目数
+        """
+        count = 0
+        for shard in self._shards:
+            with shard.lock:
+                count += len(shard.map)
+                shard.reset()
+        logger.info(f"Cache cleared ({count} entries)")
+        return count
+
+    def clear_prefix(self, prefix: str) -> int:
+        """
+        清除指定前缀的缓存项（按keyspace定向失效）
+
+        Args:
+            prefix: 缓存键前缀
+
+        Returns:
+            清除的条目数
+        """
+        cleared = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys_to_remove = [k for k in shard.map if k.startswith(prefix)]
+                for key in keys_to_remove:
+                    shard.unlink(shard.map.pop(key))
+                cleared += len(keys_to_remove)
+
+        if cleared:
+            logger.info(f"Cleared {cleared} cache entries with prefix '{prefix}'")
+
+        return cleared
+
     def cleanup_expired(self) -> int:
         """
         清理过期的缓存项
-        
+
         Returns:
             清理的条目数
         """
-        current_time = time.time()
-        expired_keys = []
-        
-        with self._lock:
-            for key, entry in list(self._cache.items()):
-                if current_time > entry.expiry:
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                del self._cache[key]
-        
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
-        
-        return len(expired_keys)
-    
+        current_time = _now()
+        cleaned = 0
+
+        for shard in self._shards:
+            with shard.lock:
+                heap = shard.expiry_heap
+                # 只处理已到期的堆顶，代价与过期条目数成正比，
+                # 不再在锁内复制整张表
+                while heap and heap[0][0] <= current_time:
+                    _, key = heapq.heappop(heap)
+                    node = shard.map.get(key)
+                    # 墓碑（键已删除）或条目被覆盖续期：跳过
+                    if node is None or node.expiry > current_time:
+                        continue
+                    shard.unlink(node)
+                    del shard.map[key]
+                    cleaned += 1
+
+        if cleaned:
+            logger.debug(f"Cleaned up {cleaned} expired cache entries")
+
+        return cleaned
+
     def get_stats(self) -> Dict[str, Any]:
         """
         获取缓存统计信息
-        
+
         Returns:
             包含统计信息的字典
         """
-        with self._lock:
-            current_time = time.time()
-            total = len(self._cache)
-            expired = sum(
-                1 for entry in self._cache.values() 
-                if current_time > entry.expiry
-            )
-            
-            total_requests = self._hits + self._misses
-            hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0.0
-            
-            return {
-                "total_entries": total,
-                "expired_entries": expired,
-                "active_entries": total - expired,
-                "max_size": self.max_size,
-                "hits": self._hits,
-                "misses": self._misses,
-                "hit_rate": round(hit_rate, 2),
-                "evictions": self._evictions,
-                "cache_enabled": settings.ENABLE_CACHE
-            }
-    
+        current_time = _now()
+        total = 0
+        expired = 0
+
+        for shard in self._shards:
+            with shard.lock:
+                total += len(shard.map)
+                expired += sum(
+                    1 for node in shard.map.values()
+                    if current_time > node.expiry
+                )
+
+        hits = _peek(self._hit_counter)
+        misses = _peek(self._miss_counter)
+        total_requests = hits + misses
+        hit_rate = (hits / total_requests * 100) if total_requests > 0 else 0.0
+
+        return {
+            "total_entries": total,
+            "expired_entries": expired,
+            "active_entries": total - expired,
+            "max_size": self.max_size,
+            "num_shards": self._num_shards,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hit_rate, 2),
+            "evictions": _peek(self._eviction_counter),
+            "admission_rejects": _peek(self._admission_reject_counter),
+            "cache_enabled": settings.ENABLE_CACHE
+        }
+
     def reset_stats(self) -> None:
         """重置统计信息"""
-        with self._lock:
-            self._hits = 0
-            self._misses = 0
-            self._evictions = 0
-    
+        self._hit_counter = itertools.count()
+        self._miss_counter = itertools.count()
+        self._eviction_counter = itertools.count()
+        self._admission_reject_counter = itertools.count()
+
     def contains(self, key: str) -> bool:
         """
         检查键是否存在且未过期
-        
+
         Args:
             key: 缓存键
-            
+
         Returns:
             是否存在
         """
-        with self._lock:
-            if key not in self._cache:
+        now = _now()
+        shard = self._shard(key)
+        with shard.lock:
+            node = shard.map.get(key)
+            if node is None:
                 return False
-            
-            entry = self._cache[key]
-            if time.time() > entry.expiry:
-                del self._cache[key]
+
+            if now > node.expiry:
+                shard.unlink(node)
+                del shard.map[key]
                 return False
-            
+
             return True
-    
+
     def size(self) -> int:
         """获取当前缓存大小"""
-        with self._lock:
-            return len(self._cache)
+        return sum(len(shard.map) for shard in self._shards)
 
 
 # 为了向后兼容，保留SimpleCache别名
@@ -252,3 +503,38 @@ cache = LRUCache(
     max_size=getattr(settings, 'CACHE_MAX_SIZE', 10000)
 )
 
+
+# ==================== 后台TTL清扫 ====================
+# 仅靠访问时惰性过期会让死条目一直占着max_size配额，
+# 迫使LRU为腾位置淘汰活条目；定期清扫保证过期键有界延迟地被回收
+
+async def _ttl_sweeper(interval: int) -> None:
+    """周期性清理全局缓存中的过期条目"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            cache.cleanup_expired()
+        except Exception as e:
+            logger.error(f"Cache TTL sweeper error: {e}", exc_info=True)
+
+
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+def start_sweeper(interval: int = 60) -> None:
+    """启动后台TTL清扫任务（在应用lifespan的startup阶段调用）"""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.get_running_loop().create_task(
+            _ttl_sweeper(interval)
+        )
+        logger.info(f"Cache TTL sweeper started (interval={interval}s)")
+
+
+def stop_sweeper() -> None:
+    """停止后台TTL清扫任务（在shutdown阶段调用）"""
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        _sweeper_task = None
+        logger.info("Cache TTL sweeper stopped")
@@ -1,7 +1,25 @@
+from functools import cached_property
 from typing import Dict, Any, List
 from pydantic import model_validator, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# 各LLM提供商的默认值来源字段：(api_key, model, api_base)
+# api_base为None表示该提供商不使用api_base（会被显式清空）
+# 模块级常量：每次实例化Settings（测试里很频繁）不再重建分支逻辑
+_LLM_DEFAULT_FIELDS = {
+    "openai": ("OPENAI_API_KEY", "OPENAI_MODEL", "OPENAI_API_BASE"),
+    "anthropic": ("ANTHROPIC_API_KEY", "ANTHROPIC_MODEL", None),
+    "vllm": ("VLLM_API_KEY", "VLLM_MODEL", "VLLM_API_BASE"),
+}
+
+# 各向量数据库提供商的默认集合名来源字段（chroma用固定名）
+_VECTOR_COLLECTION_FIELDS = {
+    "milvus": "MILVUS_COLLECTION",
+    "pinecone": "PINECONE_INDEX",
+    "qdrant": "QDRANT_COLLECTION",
+}
+_CHROMA_DEFAULT_COLLECTION = "enterprise_knowledge"
+
 
 class Settings(BaseSettings):
     """
@@ -120,9 +138,28 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = False  # 生产环境建议启用
     RATE_LIMIT_REQUESTS: int = 100  # 时间窗口内允许的请求数
     RATE_LIMIT_WINDOW: int = 60  # 时间窗口（秒）
+    RATE_LIMIT_DISTRIBUTED: bool = False  # 多worker部署时启用Redis分布式限流
 
     # 允许 Pydantic 读取 .env 文件
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
+
+    # --- 规范化的提供商名称（只计算一次的小写形式） ---
+    # 配置装配和校验各处都要比较provider，缓存住避免反复.lower()
+
+    @cached_property
+    def llm_provider_norm(self) -> str:
+        """LLM提供商名称（小写）"""
+        return self.LLM_PROVIDER.lower()
+
+    @cached_property
+    def vector_store_provider_norm(self) -> str:
+        """向量数据库提供商名称（小写）"""
+        return self.VECTOR_STORE_PROVIDER.lower()
+
+    @cached_property
+    def memory_provider_norm(self) -> str:
+        """记忆提供商名称（小写）"""
+        return self.MEMORY_PROVIDER.lower()
     
     @model_validator(mode='after')
     def _setup_all_configs(self):
@@ -136,52 +173,36 @@ class Settings(BaseSettings):
         return self
     
     def _setup_llm_config(self) -> None:
-        """根据provider自动设置LLM配置"""
-        provider = self.LLM_PROVIDER.lower()
-        
-        if provider == "openai":
-            if not self.LLM_API_KEY:
-                object.__setattr__(self, 'LLM_API_KEY', self.OPENAI_API_KEY)
-            if not self.LLM_MODEL_NAME:
-                object.__setattr__(self, 'LLM_MODEL_NAME', self.OPENAI_MODEL)
-            if not self.LLM_API_BASE:
-                object.__setattr__(self, 'LLM_API_BASE', self.OPENAI_API_BASE or "")
-        elif provider == "anthropic":
-            if not self.LLM_API_KEY:
-                object.__setattr__(self, 'LLM_API_KEY', self.ANTHROPIC_API_KEY)
-            if not self.LLM_MODEL_NAME:
-                object.__setattr__(self, 'LLM_MODEL_NAME', self.ANTHROPIC_MODEL)
+        """根据provider自动设置LLM配置（查表，幂等）"""
+        provider = self.llm_provider_norm
+
+        # provider未设置或无效时退回vLLM默认值
+        key_field, model_field, base_field = _LLM_DEFAULT_FIELDS.get(
+            provider, _LLM_DEFAULT_FIELDS["vllm"]
+        )
+
+        if not self.LLM_API_KEY:
+            object.__setattr__(self, 'LLM_API_KEY', getattr(self, key_field))
+        if not self.LLM_MODEL_NAME:
+            object.__setattr__(self, 'LLM_MODEL_NAME', getattr(self, model_field))
+
+        if base_field is None:
             object.__setattr__(self, 'LLM_API_BASE', "")  # Anthropic不需要api_base
-        elif provider == "vllm":
-            if not self.LLM_API_KEY:
-                object.__setattr__(self, 'LLM_API_KEY', self.VLLM_API_KEY)
-            if not self.LLM_MODEL_NAME:
-                object.__setattr__(self, 'LLM_MODEL_NAME', self.VLLM_MODEL)
-            if not self.LLM_API_BASE:
-                object.__setattr__(self, 'LLM_API_BASE', self.VLLM_API_BASE)
-        else:
-            # 如果provider未设置或无效，尝试使用vLLM配置作为默认值
-            if not self.LLM_API_KEY:
-                object.__setattr__(self, 'LLM_API_KEY', self.VLLM_API_KEY)
-            if not self.LLM_MODEL_NAME:
-                object.__setattr__(self, 'LLM_MODEL_NAME', self.VLLM_MODEL)
-            if not self.LLM_API_BASE:
-                object.__setattr__(self, 'LLM_API_BASE', self.VLLM_API_BASE)
-    
+        elif not self.LLM_API_BASE:
+            object.__setattr__(self, 'LLM_API_BASE', getattr(self, base_field) or "")
+
     def _setup_vector_store_config(self) -> None:
-        """根据provider自动设置向量数据库配置"""
-        provider = self.VECTOR_STORE_PROVIDER.lower()
-        
-        collection_map = {
-            "milvus": self.MILVUS_COLLECTION,
-            "chroma": "enterprise_knowledge",
-            "pinecone": self.PINECONE_INDEX,
-            "qdrant": self.QDRANT_COLLECTION,
-        }
-        
-        if not self.VECTOR_STORE_COLLECTION:
-            collection = collection_map.get(provider, self.MILVUS_COLLECTION)
-            object.__setattr__(self, 'VECTOR_STORE_COLLECTION', collection)
+        """根据provider自动设置向量数据库配置（查表，幂等）"""
+        if self.VECTOR_STORE_COLLECTION:
+            return
+
+        provider = self.vector_store_provider_norm
+        if provider == "chroma":
+            collection = _CHROMA_DEFAULT_COLLECTION
+        else:
+            field = _VECTOR_COLLECTION_FIELDS.get(provider, "MILVUS_COLLECTION")
+            collection = getattr(self, field)
+        object.__setattr__(self, 'VECTOR_STORE_COLLECTION', collection)
 
 
 # 全局配置实例
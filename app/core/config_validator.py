@@ -3,7 +3,8 @@
 
 提供全面的配置验证，确保应用正确配置
 """
-from typing import List, Tuple, Dict, Any
+from types import MappingProxyType
+from typing import List, Tuple, Dict, Any, Optional
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.exceptions import ValidationException
@@ -64,15 +65,23 @@ class ConfigValidator:
         
         return is_valid, errors + warnings
     
-    @staticmethod
-    def get_config_summary() -> Dict[str, Any]:
+    # 配置摘要缓存：Settings启动后不变，摘要只需构建一次
+    _summary_cache: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def get_config_summary(cls) -> Dict[str, Any]:
         """
-        获取配置摘要（用于诊断）
-        
+        获取配置摘要（用于诊断，首次调用后缓存）
+
+        返回只读视图，防止调用方意外修改共享的缓存字典
+
         Returns:
             配置摘要字典
         """
-        return {
+        if cls._summary_cache is not None:
+            return cls._summary_cache
+
+        summary = {
             "llm": {
                 "provider": settings.LLM_PROVIDER,
                 "model": settings.LLM_MODEL_NAME,
@@ -103,65 +112,80 @@ class ConfigValidator:
                 "cache_max_size": settings.CACHE_MAX_SIZE,
             }
         }
+
+        cls._summary_cache = MappingProxyType(
+            {k: MappingProxyType(v) for k, v in summary.items()}
+        )
+        return cls._summary_cache
+
+    @classmethod
+    def invalidate_summary(cls) -> None:
+        """失效配置摘要缓存（测试或配置热重载后调用）"""
+        cls._summary_cache = None
     
     @staticmethod
     def _validate_llm_config() -> List[str]:
         """验证LLM配置"""
+        # 绑定局部变量：pydantic属性访问走描述符协议，不是免费的，
+        # 每个方法只解引用一次，热重载场景下可以反复调用
+        s = settings
         errors = []
-        provider = settings.LLM_PROVIDER.lower()
-        
+        provider = s.llm_provider_norm
+
         if provider == "openai":
-            if not settings.OPENAI_API_KEY and not settings.LLM_API_KEY:
+            if not s.OPENAI_API_KEY and not s.LLM_API_KEY:
                 errors.append("OpenAI API key is required when LLM_PROVIDER=openai")
         elif provider == "anthropic":
-            if not settings.ANTHROPIC_API_KEY and not settings.LLM_API_KEY:
+            if not s.ANTHROPIC_API_KEY and not s.LLM_API_KEY:
                 errors.append("Anthropic API key is required when LLM_PROVIDER=anthropic")
         elif provider == "vllm":
-            if not settings.VLLM_API_BASE and not settings.LLM_API_BASE:
+            if not s.VLLM_API_BASE and not s.LLM_API_BASE:
                 errors.append("vLLM API base is required when LLM_PROVIDER=vllm")
-        
-        if not settings.LLM_MODEL_NAME:
+
+        if not s.LLM_MODEL_NAME:
             errors.append("LLM_MODEL_NAME is required")
-        
+
         return errors
     
     @staticmethod
     def _validate_vector_store_config() -> List[str]:
         """验证向量数据库配置"""
+        s = settings
         errors = []
-        provider = settings.VECTOR_STORE_PROVIDER.lower()
-        
+        provider = s.vector_store_provider_norm
+
         if provider == "milvus":
-            if not settings.MILVUS_URI:
+            if not s.MILVUS_URI:
                 errors.append("MILVUS_URI is required when VECTOR_STORE_PROVIDER=milvus")
         elif provider == "pinecone":
-            if not settings.PINECONE_API_KEY:
+            if not s.PINECONE_API_KEY:
                 errors.append("PINECONE_API_KEY is required when VECTOR_STORE_PROVIDER=pinecone")
         elif provider == "qdrant":
-            if not settings.QDRANT_URL:
+            if not s.QDRANT_URL:
                 errors.append("QDRANT_URL is required when VECTOR_STORE_PROVIDER=qdrant")
-        
-        if not settings.VECTOR_STORE_COLLECTION:
+
+        if not s.VECTOR_STORE_COLLECTION:
             errors.append("VECTOR_STORE_COLLECTION is required")
-        
-        if settings.VECTOR_STORE_DIM <= 0:
+
+        if s.VECTOR_STORE_DIM <= 0:
             errors.append("VECTOR_STORE_DIM must be greater than 0")
-        
+
         return errors
     
     @staticmethod
     def _validate_memory_config() -> List[str]:
         """验证记忆配置"""
+        s = settings
         errors = []
-        provider = settings.MEMORY_PROVIDER.lower()
-        
-        if provider in ["llamaindex", "langchain"]:
-            if settings.LONG_TERM_MEMORY_ENABLED and not settings.REDIS_URL:
+        provider = s.memory_provider_norm
+
+        if provider in ("llamaindex", "langchain"):
+            if s.LONG_TERM_MEMORY_ENABLED and not s.REDIS_URL:
                 errors.append("REDIS_URL is required when LONG_TERM_MEMORY_ENABLED=true")
-        
-        if settings.SHORT_TERM_TOKEN_LIMIT <= 0:
+
+        if s.SHORT_TERM_TOKEN_LIMIT <= 0:
             errors.append("SHORT_TERM_TOKEN_LIMIT must be greater than 0")
-        
+
         return errors
     
     @staticmethod
@@ -172,49 +196,51 @@ class ConfigValidator:
         Returns:
             (errors, warnings): 错误和警告列表
         """
+        s = settings
         errors = []
         warnings = []
-        
+
         # CORS配置
-        if settings.ALLOWED_ORIGINS == ["*"]:
+        if s.ALLOWED_ORIGINS == ["*"]:
             warnings.append("ALLOWED_ORIGINS is set to '*' - not recommended for production")
-        
+
         # API密钥配置
-        if not settings.API_KEY_REQUIRED:
+        if not s.API_KEY_REQUIRED:
             warnings.append("API_KEY_REQUIRED is false - API is publicly accessible")
-        
-        if settings.API_KEY_REQUIRED and not settings.API_KEYS:
+
+        if s.API_KEY_REQUIRED and not s.API_KEYS:
             errors.append("API_KEYS is required when API_KEY_REQUIRED=true")
-        
-        if settings.API_KEY_REQUIRED and settings.API_KEYS:
+
+        if s.API_KEY_REQUIRED and s.API_KEYS:
             # 检查API密钥强度
-            for i, key in enumerate(settings.API_KEYS):
+            for i, key in enumerate(s.API_KEYS):
                 if len(key) < 16:
                     warnings.append(f"API key {i+1} is too short (< 16 chars) - consider using longer keys")
-        
+
         # 速率限制
-        if not settings.RATE_LIMIT_ENABLED:
+        if not s.RATE_LIMIT_ENABLED:
             warnings.append("RATE_LIMIT_ENABLED is false - API may be vulnerable to abuse")
-        
+
         return errors, warnings
     
     @staticmethod
     def _validate_performance_config() -> List[str]:
         """验证性能配置"""
+        s = settings
         errors = []
-        
-        if settings.CACHE_TTL <= 0:
+
+        if s.CACHE_TTL <= 0:
             errors.append("CACHE_TTL must be greater than 0")
-        
-        if settings.CACHE_MAX_SIZE <= 0:
+
+        if s.CACHE_MAX_SIZE <= 0:
             errors.append("CACHE_MAX_SIZE must be greater than 0")
-        
-        if settings.BATCH_SIZE <= 0:
+
+        if s.BATCH_SIZE <= 0:
             errors.append("BATCH_SIZE must be greater than 0")
-        
-        if settings.REQUEST_TIMEOUT <= 0:
+
+        if s.REQUEST_TIMEOUT <= 0:
             errors.append("REQUEST_TIMEOUT must be greater than 0")
-        
+
         return errors
     
     @staticmethod
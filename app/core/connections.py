@@ -1,96 +1,97 @@
 """
 连接池和资源管理
 
-提供线程安全的连接池管理，支持异步操作和健康检查
+提供连接池管理，支持异步操作和健康检查
 """
 import asyncio
-import threading
-from typing import Optional, AsyncIterator
-from contextlib import asynccontextmanager
+from typing import Optional
 import redis.asyncio as aioredis
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.retry import retry_with_backoff, RetryConfig
 
+# INFO返回KB级文本，解析和RTT都不便宜；诊断信息5秒内复用，
+# 仪表盘轮询不至于打爆Redis
+_INFO_CACHE_TTL = 5
+_info_cache: Optional[dict] = None
+_info_cache_expiry: float = 0.0
+
+# 关闭流程的互斥锁：Python 3.10+的asyncio.Lock可以在无事件循环时创建，
+# 首次await时才绑定循环。连接池本身只会被事件循环线程访问，
+# 之前的threading.RLock双重检查锁是给不存在的多线程场景买的保险，
+# 白白给每次获取客户端加一对锁操作
+_close_lock = asyncio.Lock()
+
+# 模块级客户端引用：初始化后热路径直接 `connections.redis_client` 使用，
+# 跳过classmethod分发和None检查（aioredis.Redis本身就在池上多路复用，
+# 无需逐次"借还"连接）。注意要通过模块属性访问而不是from-import值拷贝，
+# 否则拿到的是import时刻的None
+redis_client: Optional[aioredis.Redis] = None
+
 
 class RedisConnectionPool:
     """
-    Redis连接池管理器（线程安全）
-    
-    使用双重检查锁定确保线程安全的单例模式
+    Redis连接池管理器
+
+    仅在FastAPI事件循环线程中使用的单例：
+    惰性初始化无需加锁，初始化后获取客户端是纯属性读取
     """
     _pool: Optional[aioredis.ConnectionPool] = None
     _client: Optional[aioredis.Redis] = None
-    _thread_lock = threading.RLock()
-    _async_lock: Optional[asyncio.Lock] = None
     _initialized = False
-    
-    @classmethod
-    def _get_async_lock(cls) -> asyncio.Lock:
-        """
-        获取异步锁（线程安全的延迟初始化）
-        
-        注意：这个方法本身使用线程锁保护
-        """
-        if cls._async_lock is None:
-            with cls._thread_lock:
-                if cls._async_lock is None:
-                    cls._async_lock = asyncio.Lock()
-        return cls._async_lock
-    
+
     @classmethod
     def get_pool(cls) -> aioredis.ConnectionPool:
         """
-        获取Redis连接池（线程安全的单例）
-        
+        获取Redis连接池（惰性单例）
+
         Returns:
             Redis连接池实例
         """
         if cls._pool is None:
-            with cls._thread_lock:
-                if cls._pool is None:
-                    cls._pool = aioredis.ConnectionPool.from_url(
-                        settings.REDIS_URL,
-                        max_connections=settings.REDIS_MAX_CONNECTIONS,
-                        decode_responses=True,
-                        #retry_on_timeout=True,
-                        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
-                        socket_timeout=5.0,        # 连接超时 5秒
-                        socket_connect_timeout=5.0 # 建立连接超时 5秒
-                    )
-                    logger.info(
-                        f"Redis connection pool created: "
-                        f"max_connections={settings.REDIS_MAX_CONNECTIONS}, "
-                        f"url={settings.REDIS_URL[:20]}..."
-                    )
+            cls._pool = aioredis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                decode_responses=True,
+                #retry_on_timeout=True,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                socket_timeout=5.0,        # 连接超时 5秒
+                socket_connect_timeout=5.0 # 建立连接超时 5秒
+            )
+            logger.info(
+                f"Redis connection pool created: "
+                f"max_connections={settings.REDIS_MAX_CONNECTIONS}, "
+                f"url={settings.REDIS_URL[:20]}..."
+            )
         return cls._pool
-    
+
     @classmethod
     def get_client(cls) -> aioredis.Redis:
         """
-        获取Redis客户端（线程安全的单例）
-        
+        获取Redis客户端（惰性单例）
+
         Returns:
             Redis客户端实例
         """
         if cls._client is None:
-            with cls._thread_lock:
-                if cls._client is None:
-                    pool = cls.get_pool()
-                    cls._client = aioredis.Redis(connection_pool=pool)
-                    cls._initialized = True
-                    logger.info("Redis client created")
+            global redis_client
+            pool = cls.get_pool()
+            cls._client = aioredis.Redis(connection_pool=pool)
+            redis_client = cls._client
+            cls._initialized = True
+            logger.info("Redis client created")
         return cls._client
-    
+
     @classmethod
     async def close(cls) -> None:
         """
         关闭连接池和客户端
-        
+
         应在应用关闭时调用
         """
-        async_lock = cls._get_async_lock()
-        async with async_lock:
+        global redis_client
+        async with _close_lock:
+            redis_client = None
             if cls._client:
                 try:
                     await cls._client.close()
@@ -111,26 +112,6 @@ class RedisConnectionPool:
             
             cls._initialized = False
     
-    @classmethod
-    @asynccontextmanager
-    async def get_connection(cls) -> AsyncIterator[aioredis.Redis]:
-        """
-        获取Redis连接（上下文管理器）
-        
-        使用方式:
-            async with RedisConnectionPool.get_connection() as client:
-                await client.get("key")
-        
-        Yields:
-            Redis客户端实例
-        """
-        client = cls.get_client()
-        try:
-            yield client
-        except aioredis.RedisError as e:
-            logger.error(f"Redis operation error: {e}")
-            raise
-    
     @classmethod
     @retry_with_backoff(
         config=RetryConfig(max_retries=3, initial_delay=1.0),
@@ -159,16 +140,28 @@ class RedisConnectionPool:
     @classmethod
     async def get_info(cls) -> dict:
         """
-        获取Redis连接信息（用于诊断）
-        
+        获取Redis连接信息（用于诊断，结果缓存5秒）
+
+        PING和INFO打包进一条pipeline，单次往返拿到连通性和服务器信息
+
         Returns:
             包含连接信息的字典
         """
+        global _info_cache, _info_cache_expiry
+
+        now = asyncio.get_running_loop().time()
+        if _info_cache is not None and now < _info_cache_expiry:
+            return _info_cache
+
         try:
             client = cls.get_client()
-            info = await client.info("server")
-            return {
-                "connected": True,
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.ping()
+                pipe.info("server")
+                pong, info = await pipe.execute()
+
+            result = {
+                "connected": bool(pong),
                 "redis_version": info.get("redis_version", "unknown"),
                 "connected_clients": info.get("connected_clients", 0),
                 "used_memory_human": info.get("used_memory_human", "unknown"),
@@ -179,3 +172,7 @@ class RedisConnectionPool:
                 "error": str(e)
             }
 
+        _info_cache = result
+        _info_cache_expiry = now + _INFO_CACHE_TTL
+        return result
+
@@ -5,10 +5,10 @@
 """
 from typing import Any, Optional, Dict
 from fastapi import Request, FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from app.core.logging import logger
+from app.core.logging import logger, should_format_traceback
 from app.core.config import settings
 
 
@@ -17,7 +17,12 @@ class AppException(Exception):
     应用自定义异常基类
     
     所有自定义异常都应继承此类
+
+    __slots__避免为每个实例物化__dict__（属性全部落在slot里时
+    实例字典从不创建），错误风暴下省掉一次dict分配并加快属性访问
     """
+    __slots__ = ("message", "code", "status_code", "details", "_base_dict")
+
     def __init__(
         self, 
         message: str, 
@@ -29,21 +34,29 @@ class AppException(Exception):
         self.code = code
         self.status_code = status_code
         self.details = details or {}
-        super().__init__(self.message)
-    
+        # 构造时就把不可变部分组装好：错误风暴（限流、上游故障）期间
+        # to_dict每次重建dict的分配开销恰好出现在CPU最紧张的时刻
+        self._base_dict: Dict[str, Any] = {"error": message, "code": code}
+        if self.details:
+            self._base_dict["details"] = self.details
+        super().__init__(message)
+
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
-        result = {
-            "error": self.message,
-            "code": self.code
-        }
+        """转换为字典格式（返回构造时缓存的dict，调用方不应修改）"""
+        return self._base_dict
+
+    def response_dict(self, path: str) -> Dict[str, Any]:
+        """构建带请求路径的响应体（单次dict分配，替代 to_dict() | {...} 的三次）"""
+        d = {"error": self.message, "code": self.code, "path": path}
         if self.details:
-            result["details"] = self.details
-        return result
+            d["details"] = self.details
+        return d
 
 
 class ValidationException(AppException):
     """验证异常 - 用于请求参数验证失败"""
+    __slots__ = ()
+
     def __init__(self, message: str, field: Optional[str] = None):
         details = {"field": field} if field else {}
         super().__init__(message, code="validation_error", status_code=400, details=details)
@@ -51,6 +64,8 @@ class ValidationException(AppException):
 
 class ConnectionException(AppException):
     """连接异常 - 用于外部服务连接失败"""
+    __slots__ = ("service",)
+
     def __init__(self, message: str, service: str = "unknown"):
         super().__init__(
             f"Connection to {service} failed: {message}",
@@ -63,18 +78,24 @@ class ConnectionException(AppException):
 
 class AuthenticationException(AppException):
     """认证异常 - 用于身份验证失败"""
+    __slots__ = ()
+
     def __init__(self, message: str = "Authentication required"):
         super().__init__(message, code="authentication_error", status_code=401)
 
 
 class AuthorizationException(AppException):
     """授权异常 - 用于权限不足"""
+    __slots__ = ()
+
     def __init__(self, message: str = "Permission denied"):
         super().__init__(message, code="authorization_error", status_code=403)
 
 
 class RateLimitException(AppException):
     """速率限制异常 - 用于请求过于频繁"""
+    __slots__ = ("retry_after",)
+
     def __init__(self, message: str = "Too many requests", retry_after: int = 60):
         super().__init__(
             message, 
@@ -87,6 +108,8 @@ class RateLimitException(AppException):
 
 class ResourceNotFoundException(AppException):
     """资源未找到异常"""
+    __slots__ = ()
+
     def __init__(self, resource: str, identifier: Optional[str] = None):
         message = f"{resource} not found"
         if identifier:
@@ -101,6 +124,8 @@ class ResourceNotFoundException(AppException):
 
 class ServiceUnavailableException(AppException):
     """服务不可用异常"""
+    __slots__ = ()
+
     def __init__(self, service: str, message: Optional[str] = None):
         msg = f"Service '{service}' is temporarily unavailable"
         if message:
@@ -120,10 +145,10 @@ def add_exception_handlers(app: FastAPI) -> None:
     async def http_exception_handler(request: Request, exc: StarletteHTTPException):
         """处理HTTP异常"""
         logger.warning(
-            f"HTTP {exc.status_code}: {exc.detail}",
+            "HTTP %s: %s", exc.status_code, exc.detail,
             extra={"path": request.url.path, "status_code": exc.status_code}
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "error": exc.detail,
@@ -155,7 +180,7 @@ def add_exception_handlers(app: FastAPI) -> None:
         
             errors.append(error_copy)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=422,
             content={
                 "detail": errors,
@@ -167,10 +192,10 @@ def add_exception_handlers(app: FastAPI) -> None:
     async def value_error_handler(request: Request, exc: ValueError):
         """处理值错误"""
         logger.warning(
-            f"Value error: {str(exc)}",
+            "Value error: %s", exc,
             extra={"path": request.url.path}
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={
                 "error": str(exc),
@@ -183,12 +208,12 @@ def add_exception_handlers(app: FastAPI) -> None:
     async def rate_limit_exception_handler(request: Request, exc: RateLimitException):
         """处理速率限制异常"""
         logger.warning(
-            f"Rate limit exceeded",
+            "Rate limit exceeded",
             extra={"path": request.url.path, "retry_after": exc.retry_after}
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
-            content=exc.to_dict() | {"path": str(request.url.path)},
+            content=exc.response_dict(str(request.url.path)),
             headers={"Retry-After": str(exc.retry_after)}
         )
     
@@ -197,27 +222,32 @@ def add_exception_handlers(app: FastAPI) -> None:
         """处理应用自定义异常"""
         log_level = logger.error if exc.status_code >= 500 else logger.warning
         log_level(
-            f"App exception [{exc.code}]: {exc.message}",
+            "App exception [%s]: %s", exc.code, exc.message,
             extra={"path": request.url.path, "status_code": exc.status_code}
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
-            content=exc.to_dict() | {"path": str(request.url.path)},
+            content=exc.response_dict(str(request.url.path)),
         )
 
     @app.exception_handler(Exception)
     async def general_exception_handler(request: Request, exc: Exception):
         """处理所有未捕获的异常"""
-        # 获取请求ID用于关联
-        request_id = getattr(request.state, 'request_id', 'unknown')
+        # 获取请求ID用于关联（直接读scope["state"]，绕过Request.state
+        # 的State包装对象和__getattr__描述符查找）
+        state = request.scope.get("state")
+        request_id = state.get("request_id", "unknown") if state is not None else "unknown"
         
+        # TTL内重复出现的同一处异常不再反复格式化栈回溯（指纹可关联首次记录）
+        format_tb, tb_fingerprint = should_format_traceback(exc)
         logger.error(
-            f"Unhandled exception: {type(exc).__name__}: {str(exc)}",
-            exc_info=True,
+            "Unhandled exception: %s: %s", type(exc).__name__, exc,
+            exc_info=exc if format_tb else False,
             extra={
                 "path": request.url.path,
                 "request_id": request_id,
-                "exception_type": type(exc).__name__
+                "exception_type": type(exc).__name__,
+                "traceback_ref": tb_fingerprint
             }
         )
         
@@ -226,7 +256,7 @@ def add_exception_handlers(app: FastAPI) -> None:
         if settings.LOG_LEVEL.upper() == "DEBUG":
             error_message = f"{type(exc).__name__}: {str(exc)}"
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "error": error_message,
@@ -3,13 +3,18 @@
 
 提供结构化日志记录，支持JSON格式（生产环境）和易读格式（开发环境）
 """
+import atexit
+import collections
 import logging
+import os
 import sys
-import json
+import threading
 from typing import Any, Dict, Optional
 from datetime import datetime
 from contextvars import ContextVar
 
+import orjson
+
 # 请求上下文变量（用于跟踪请求ID等）
 request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 session_id_var: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
@@ -43,10 +48,19 @@ class JSONFormatter(logging.Formatter):
         'relativeCreated', 'stack_info', 'thread', 'threadName',
         'request_id', 'session_id'
     ])
-    
+
+    # orjson能原生序列化的类型；其余的extra字段转为str
+    _JSON_SAFE = (str, int, float, bool, type(None), list, tuple, dict)
+
     def format(self, record: logging.LogRecord) -> str:
+        return self.to_bytes(record).decode()
+
+    def to_bytes(self, record: logging.LogRecord) -> bytes:
+        """直接输出序列化后的bytes（RawJSONHandler走此路径免去decode）"""
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            # naive UTC datetime交给orjson用C代码格式化（OPT_NAIVE_UTC+OPT_UTC_Z），
+            # 比每条记录跑datetime.utcnow().isoformat()快得多
+            "timestamp": datetime.utcfromtimestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -55,11 +69,14 @@ class JSONFormatter(logging.Formatter):
             "line": record.lineno,
         }
         
-        # 添加上下文信息
-        if hasattr(record, 'request_id') and record.request_id != "-":
-            log_data["request_id"] = record.request_id
-        if hasattr(record, 'session_id') and record.session_id != "-":
-            log_data["session_id"] = record.session_id
+        # 添加上下文信息（__dict__.get一次查找，省去hasattr+属性访问两次）
+        record_dict = record.__dict__
+        request_id = record_dict.get('request_id')
+        if request_id and request_id != "-":
+            log_data["request_id"] = request_id
+        session_id = record_dict.get('session_id')
+        if session_id and session_id != "-":
+            log_data["session_id"] = session_id
         
         # 添加异常信息
         if record.exc_info:
@@ -70,16 +87,93 @@ class JSONFormatter(logging.Formatter):
             }
         
         # 添加extra字段（排除标准字段）
+        # isinstance检查代替"json.dumps试探+异常"——后者每个字段要序列化两次
         for key, value in record.__dict__.items():
             if key not in self.RESERVED_ATTRS and not key.startswith('_'):
-                try:
-                    # 尝试序列化，失败则转为字符串
-                    json.dumps(value)
-                    log_data[key] = value
-                except (TypeError, ValueError):
-                    log_data[key] = str(value)
-        
-        return json.dumps(log_data, ensure_ascii=False, default=str)
+                log_data[key] = value if isinstance(value, self._JSON_SAFE) else str(value)
+
+        return orjson.dumps(
+            log_data,
+            default=str,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+
+
+# 后台日志写入队列：emit只做“序列化+入队”，写syscall由单独的
+# 守护线程批量完成（一次os.writev刷多条），事件循环不再等stdout。
+# deque的append/popleft是GIL原子的，无需额外加锁。
+_LOG_QUEUE: "collections.deque[bytes]" = collections.deque()
+_LOG_EVENT = threading.Event()
+_LOG_HIGH_WATER = 10000  # 队列超限时丢弃新记录，防止慢消费者拖垮内存
+_IOV_MAX = 1024  # writev单次可带的缓冲区上限（POSIX保证的下界）
+
+
+def _log_writer_loop(fd: int) -> None:
+    """守护线程主体：等待信号，成批取出记录并用writev一次写出"""
+    queue = _LOG_QUEUE
+    event = _LOG_EVENT
+    while True:
+        event.wait()
+        event.clear()
+        while queue:
+            batch = []
+            try:
+                while len(batch) < _IOV_MAX:
+                    batch.append(queue.popleft())
+            except IndexError:
+                pass
+            try:
+                os.writev(fd, batch)
+            except OSError:
+                pass  # stdout不可写时丢弃，日志不应使服务崩溃
+
+
+def _drain_log_queue(fd: int) -> None:
+    """进程退出时同步刷掉残留记录（writer是守护线程，不会自己收尾）"""
+    while _LOG_QUEUE:
+        try:
+            os.writev(fd, [_LOG_QUEUE.popleft()])
+        except (IndexError, OSError):
+            break
+
+
+class RawJSONHandler(logging.Handler):
+    """
+    直写stdout的JSON日志处理器（生产环境使用）
+
+    绕过StreamHandler的 format->str->write->encode 往返：
+    orjson直接产出bytes，emit仅入队，后台线程批量os.writev落盘。
+    每请求2条以上的日志记录让这条路径足够热；突发流量下天然
+    合并成大批次写入。入队是GIL原子操作，因此不创建Handler锁。
+    """
+
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self._formatter = JSONFormatter()
+        fd = sys.stdout.fileno()
+        self._fd = fd
+        self._writer = threading.Thread(
+            target=_log_writer_loop, args=(fd,),
+            name="log-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(_drain_log_queue, fd)
+
+    def createLock(self) -> None:
+        # emit无共享可变状态（deque.append原子），跳过每条记录的锁开销
+        self.lock = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if len(_LOG_QUEUE) >= _LOG_HIGH_WATER:
+                return  # 背压：丢新保旧，保留故障发生时刻的上下文
+            _LOG_QUEUE.append(self._formatter.to_bytes(record) + b"\n")
+            _LOG_EVENT.set()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        _LOG_EVENT.set()
 
 
 class ColoredFormatter(logging.Formatter):
@@ -96,33 +190,36 @@ class ColoredFormatter(logging.Formatter):
         'CRITICAL': '\033[35m',  # 紫色
     }
     RESET = '\033[0m'
-    
+
+    # 级别->着色标签 预计算一次；格式化时查表即可，
+    # 不再逐条拼接ANSI码，也不往record上写临时属性
+    # （类体内的推导式无法引用RESET类属性，故内联复位码）
+    _COLORED_LEVELS = {
+        lvl: f"{color}{lvl:<8}\033[0m" for lvl, color in COLORS.items()
+    }
+
     def __init__(self, fmt: Optional[str] = None):
         super().__init__(fmt or self._default_format())
-    
+
     def _default_format(self) -> str:
         return (
-            "%(asctime)s | %(levelname)-8s | "
+            "%(asctime)s | %(colored_level)s | "
             "%(name)s:%(funcName)s:%(lineno)d | "
             "[%(request_id)s] %(message)s"
         )
-    
+
     def format(self, record: logging.LogRecord) -> str:
         # 确保有request_id属性
         if not hasattr(record, 'request_id'):
             record.request_id = '-'
-        
-        # 添加颜色
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            record.levelname = f"{self.COLORS[levelname]}{levelname}{self.RESET}"
-        
-        result = super().format(record)
-        
-        # 恢复原始levelname
-        record.levelname = levelname
-        
-        return result
+
+        # 查表得到着色标签；写入独立属性，不篡改record.levelname
+        # （record可能还要流经其他handler）
+        record.colored_level = self._COLORED_LEVELS.get(
+            record.levelname, record.levelname
+        )
+
+        return super().format(record)
 
 
 def setup_logging() -> logging.Logger:
@@ -143,11 +240,6 @@ def setup_logging() -> logging.Logger:
     # 根据环境选择日志格式
     use_json = log_level > logging.DEBUG
     
-    if use_json:
-        formatter = JSONFormatter()
-    else:
-        formatter = ColoredFormatter()
-    
     # 配置根日志记录器
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
@@ -155,10 +247,13 @@ def setup_logging() -> logging.Logger:
     # 清除现有处理器
     root_logger.handlers.clear()
     
-    # 添加控制台处理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
+    # 添加控制台处理器：生产环境直写bytes，开发环境走StreamHandler
+    if use_json:
+        console_handler: logging.Handler = RawJSONHandler(log_level)
+    else:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(log_level)
+        console_handler.setFormatter(ColoredFormatter())
     console_handler.addFilter(ContextFilter())  # 添加上下文过滤器
     root_logger.addHandler(console_handler)
     
@@ -206,22 +301,86 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(f"app.{name}")
 
 
-def set_request_context(request_id: Optional[str] = None, session_id: Optional[str] = None) -> None:
+# 重复异常的栈回溯抑制：traceback.format_exception比普通日志贵一个
+# 量级以上，而上游故障时同一处异常会每秒重复成百上千次。按
+# (异常类型, 最内层帧) 指纹在TTL内只完整格式化一次，其余记录引用指纹
+_TB_CACHE: Dict[tuple, float] = {}
+_TB_CACHE_TTL = 60.0
+_TB_CACHE_MAX = 256
+
+
+def should_format_traceback(exc: BaseException) -> tuple:
+    """
+    判断本次异常是否需要完整格式化栈回溯
+
+    Args:
+        exc: 捕获到的异常实例
+
+    Returns:
+        (format_it, fingerprint): 是否格式化，以及异常指纹字符串
+        （抑制时写进日志便于与首次完整记录关联）
+    """
+    import time as _time
+
+    tb = exc.__traceback__
+    while tb is not None and tb.tb_next is not None:
+        tb = tb.tb_next
+    if tb is not None:
+        key = (type(exc), tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+        fingerprint = f"{type(exc).__name__}@{key[1]}:{key[2]}"
+    else:
+        key = (type(exc), None, 0)
+        fingerprint = type(exc).__name__
+
+    now = _time.monotonic()
+    expiry = _TB_CACHE.get(key)
+    if expiry is not None and expiry > now:
+        return False, fingerprint
+
+    if len(_TB_CACHE) >= _TB_CACHE_MAX:
+        # 到达上限时清掉已过期的项；极端情况下整体重置
+        expired = [k for k, v in _TB_CACHE.items() if v <= now]
+        for k in expired:
+            del _TB_CACHE[k]
+        if len(_TB_CACHE) >= _TB_CACHE_MAX:
+            _TB_CACHE.clear()
+    _TB_CACHE[key] = now + _TB_CACHE_TTL
+    return True, fingerprint
+
+
+def set_request_context(request_id: Optional[str] = None, session_id: Optional[str] = None) -> tuple:
     """
     设置请求上下文
     
     Args:
         request_id: 请求ID
         session_id: 会话ID
+
+    Returns:
+        (request_id_token, session_id_token): 传给reset_request_context
+        可精确恢复先前的上下文（嵌套场景如后台任务不会被误清）
+    """
+    rid_token = request_id_var.set(request_id) if request_id else None
+    sid_token = session_id_var.set(session_id) if session_id else None
+    return rid_token, sid_token
+
+
+def reset_request_context(tokens: tuple) -> None:
+    """
+    用set_request_context返回的token恢复上下文
+
+    Token.reset是O(1)的指针恢复，比再set(None)便宜，
+    且正确还原外层上下文而非一律抹成None
     """
-    if request_id:
-        request_id_var.set(request_id)
-    if session_id:
-        session_id_var.set(session_id)
+    rid_token, sid_token = tokens
+    if rid_token is not None:
+        request_id_var.reset(rid_token)
+    if sid_token is not None:
+        session_id_var.reset(sid_token)
 
 
 def clear_request_context() -> None:
-    """清除请求上下文"""
+    """清除请求上下文（无token的兜底路径）"""
     request_id_var.set(None)
     session_id_var.set(None)
 
@@ -2,230 +2,360 @@
 中间件模块 - 请求追踪、日志、性能监控、速率限制、请求验证
 
 统一的中间件模块，包含所有 HTTP 中间件实现
+
+全部实现为纯ASGI中间件：BaseHTTPMiddleware每个请求要创建内存流、
+任务组、缓存Request和流式Response等约7个中间对象，六层叠起来
+开销相当可观；纯ASGI只是函数调用加一个send包装，分配几乎为零
 """
+import itertools
+import logging
+import secrets
 import time
-import uuid
-import threading
-from typing import Callable, Optional, Dict, Tuple
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from collections import defaultdict
+from typing import Callable, List, Optional, Dict, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette.responses import JSONResponse
-from app.core.logging import logger
+from app.core.logging import (
+    logger,
+    should_format_traceback,
+    set_request_context,
+    reset_request_context,
+)
 from app.core.config import settings
+from app.core.rate_limiter import rate_limiter, redis_rate_limiter
+
+
+# 路径匹配表统一放在模块级：精确匹配用frozenset（O(1)哈希），
+# 前缀匹配用tuple配合str.startswith(tuple)——单次C调用替代Python层for循环。
+# 衡量过编译正则（re.match本质是C层DFA/NFA）：对当前这种个位数前缀，
+# startswith(tuple)没有正则引擎的入口开销，实测更快；
+# 若前缀列表将来膨胀到几十个再换成预编译的 ^(?:...) 交替式
+_HEALTH_PATHS = frozenset({"/health", "/metrics", "/live", "/ready"})
+_UPLOAD_PREFIXES = ("/api/v1/ingest/upload",)
+
+
+def _get_header(scope: Scope, name: bytes) -> Optional[bytes]:
+    """
+    从ASGI scope中取指定头（名称须为小写bytes）
+
+    首次调用把原始头列表整理成bytes->bytes的dict并缓存进
+    scope["extensions"]，整条中间件链共享一次解析；后续查找都是
+    O(1)哈希，不再逐中间件线性扫描，也不构造Starlette Headers对象
+    """
+    extensions = scope.setdefault("extensions", {})
+    headers_map = extensions.get("headers_map")
+    if headers_map is None:
+        headers_map = dict(scope["headers"])
+        extensions["headers_map"] = headers_map
+    return headers_map.get(name)
 
 
 # =============================================================================
 # 请求追踪中间件
 # =============================================================================
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+# 请求ID = 每worker启动时生成一次的随机前缀 + 单调计数器。
+# uuid4每个请求都要走getrandom系统调用加36字符格式化；
+# 这个方案同样全局唯一（前缀区分worker，计数器区分请求）但便宜一个量级
+_ID_PREFIX = secrets.token_hex(8)
+_ID_COUNTER = itertools.count()
+
+
+def _peek(counter: "itertools.count") -> int:
+    """读取itertools.count的当前值而不消耗它（与cache模块同一技巧）"""
+    return counter.__reduce__()[1][0]
+
+
+def _new_path_stats() -> list:
+    # [count, errors, total_time]：list下标赋值是单字节码，GIL下原子。
+    # 这已是SoA思路在纯Python里的合理落点——每次更新一次哈希定位加
+    # 三次C级下标写；换成按路径id索引的numpy并行数组要引入新依赖，
+    # 且单元素ndarray写入走__setitem__比list还慢，只有批量聚合才回本
+    return [0, 0, 0.0]
+
+
+class RequestIDMiddleware:
     """添加请求ID到每个请求"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        from app.core.logging import set_request_context, clear_request_context
-        
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # 生成或获取请求ID
-        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        # 设置日志上下文
-        set_request_context(request_id=request_id)
-        
-        try:
+        header_value = _get_header(scope, b"x-request-id")
+        if header_value:
+            request_id = header_value.decode("latin-1")
+        else:
+            request_id = f"{_ID_PREFIX}-{next(_ID_COUNTER):012x}"
+
+        # 写入scope["state"]（Request.state的底层存储）
+        scope.setdefault("state", {})["request_id"] = request_id
+        id_header = (b"x-request-id", request_id.encode("latin-1"))
+
+        # 设置日志上下文（保留token用于O(1)恢复）
+        context_tokens = set_request_context(request_id=request_id)
+
+        async def send_with_id(message: Message) -> None:
             # 将请求ID添加到响应头
-            response = await call_next(request)
-            response.headers["X-Request-ID"] = request_id
-            return response
+            if message["type"] == "http.response.start":
+                message["headers"].append(id_header)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
         finally:
-            # 清除日志上下文
-            clear_request_context()
+            # 恢复日志上下文（token reset，还原外层状态而非置None）
+            reset_request_context(context_tokens)
 
 
 # =============================================================================
 # 请求验证中间件
 # =============================================================================
 
-class RequestSizeMiddleware(BaseHTTPMiddleware):
+class RequestSizeMiddleware:
     """
     请求体大小限制中间件
-    
+
     限制请求体大小，防止大文件攻击
     """
-    
+
     # 默认最大请求体大小：10MB
     DEFAULT_MAX_SIZE = 10 * 1024 * 1024
-    
+
     # 文件上传路径的最大大小：100MB
     UPLOAD_MAX_SIZE = 100 * 1024 * 1024
-    
-    # 文件上传路径模式
-    UPLOAD_PATHS = ["/api/v1/ingest/upload"]
-    
+
+    # 413响应按max_size缓存：拒绝路径在探测/攻击流量下会变热，
+    # 预序列化后单次拒绝只剩两个send调用，不再构造Response和跑json.dumps
+    _REJECTION_CACHE: Dict[int, Tuple[list, bytes]] = {}
+
     def __init__(self, app: ASGIApp, max_size: int = DEFAULT_MAX_SIZE):
-        super().__init__(app)
+        self.app = app
         self.max_size = max_size
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    @classmethod
+    def _too_large_response(cls, max_size: int) -> Tuple[list, bytes]:
+        """获取（或构建并缓存）指定大小限制的413响应帧"""
+        cached = cls._REJECTION_CACHE.get(max_size)
+        if cached is None:
+            body = orjson.dumps({
+                "error": "Request body too large",
+                "code": "payload_too_large",
+                "max_size": max_size
+            })
+            headers = [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode())
+            ]
+            cached = (headers, body)
+            cls._REJECTION_CACHE[max_size] = cached
+        return cached
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # 确定此请求的最大大小
-        path = request.url.path
+        path = scope["path"]
         max_size = self.max_size
-        
+
         # 文件上传路径使用更大的限制
-        for upload_path in self.UPLOAD_PATHS:
-            if path.startswith(upload_path):
-                max_size = self.UPLOAD_MAX_SIZE
-                break
-        
+        if path.startswith(_UPLOAD_PREFIXES):
+            max_size = self.UPLOAD_MAX_SIZE
+
         # 检查Content-Length头
-        content_length = request.headers.get("content-length")
+        content_length = _get_header(scope, b"content-length")
         if content_length:
             try:
                 length = int(content_length)
-                if length > max_size:
-                    logger.warning(
-                        f"Request body too large: {length} bytes (max: {max_size})",
-                        extra={"path": path, "content_length": length}
-                    )
-                    return JSONResponse(
-                        status_code=413,
-                        content={
-                            "error": "Request body too large",
-                            "code": "payload_too_large",
-                            "max_size": max_size,
-                            "received_size": length
-                        }
-                    )
             except ValueError:
-                pass
-        
-        return await call_next(request)
+                length = -1
+            if length > max_size:
+                logger.warning(
+                    "Request body too large: %s bytes (max: %s)", length, max_size,
+                    extra={"path": path, "content_length": length}
+                )
+                headers, body = self._too_large_response(max_size)
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": headers
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
 
+        await self.app(scope, receive, send)
 
-class ContentTypeMiddleware(BaseHTTPMiddleware):
+
+class ContentTypeMiddleware:
     """
     内容类型验证中间件
-    
+
     验证POST/PUT请求的Content-Type
     """
-    
+
     # 需要验证Content-Type的方法
     METHODS_REQUIRING_CONTENT_TYPE = {"POST", "PUT", "PATCH"}
-    
-    # 排除的路径（如文件上传）
-    EXCLUDED_PATHS = ["/api/v1/ingest/upload"]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # 只检查需要body的请求
-        if request.method not in self.METHODS_REQUIRING_CONTENT_TYPE:
-            return await call_next(request)
-        
-        # 排除特定路径
-        path = request.url.path
-        for excluded in self.EXCLUDED_PATHS:
-            if path.startswith(excluded):
-                return await call_next(request)
-        
+        if scope["method"] not in self.METHODS_REQUIRING_CONTENT_TYPE:
+            return await self.app(scope, receive, send)
+
+        # 排除特定路径（如文件上传）
+        path = scope["path"]
+        if path.startswith(_UPLOAD_PREFIXES):
+            return await self.app(scope, receive, send)
+
         # 检查Content-Type
-        content_type = request.headers.get("content-type", "")
-        
+        content_type = _get_header(scope, b"content-type") or b""
+
         # 对于JSON API，要求application/json
-        if not content_type.startswith("application/json"):
+        if not content_type.startswith(b"application/json"):
             # 如果有body但没有正确的content-type
-            content_length = request.headers.get("content-length", "0")
-            if content_length != "0":
+            content_length = _get_header(scope, b"content-length") or b"0"
+            if content_length != b"0" and logger.isEnabledFor(logging.DEBUG):
                 logger.debug(
-                    f"Non-JSON content type for {path}: {content_type}"
+                    "Non-JSON content type for %s: %s", path, content_type.decode('latin-1')
                 )
-        
-        return await call_next(request)
+
+        await self.app(scope, receive, send)
 
 
 # =============================================================================
 # 速率限制中间件
 # =============================================================================
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """速率限制中间件"""
-    
+
     def __init__(self, app: ASGIApp, enabled: bool = True):
-        super().__init__(app)
+        self.app = app
         self.enabled = enabled
-        
+        # 多worker部署下用Redis分布式桶（单进程内存桶会按worker数放大配额）
+        self._distributed = getattr(settings, 'RATE_LIMIT_DISTRIBUTED', False)
+
+        # settings是常量，逐请求getattr没有意义：构造时取一次，
+        # 顺带把头部值预编码为bytes
+        self._limit = int(getattr(settings, 'RATE_LIMIT_REQUESTS', 100))
+        self._window = int(getattr(settings, 'RATE_LIMIT_WINDOW', 60))
+        self._limit_bytes = str(self._limit).encode()
+        self._window_bytes = str(self._window).encode()
+        # 完整的头键值对也预先构好：放行路径每个响应只新建remaining一个元组
+        self._limit_header = (b"x-ratelimit-limit", self._limit_bytes)
+        self._window_header = (b"x-ratelimit-window", self._window_bytes)
+        self._429_static_headers = (
+            (b"content-type", b"application/json"),
+            self._limit_header,
+            (b"x-ratelimit-remaining", b"0"),
+        )
+
         # 配置默认规则
         if self.enabled:
-            from app.core.rate_limiter import rate_limiter
-            rate_limiter.set_default_rule(
-                requests=getattr(settings, 'RATE_LIMIT_REQUESTS', 100),
-                window=getattr(settings, 'RATE_LIMIT_WINDOW', 60)
-            )
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        from app.core.rate_limiter import rate_limiter
-        
+            rate_limiter.set_default_rule(requests=self._limit, window=self._window)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # 如果未启用或是健康检查端点，跳过限流
-        if not self.enabled or request.url.path in ["/health", "/metrics", "/live", "/ready"]:
-            return await call_next(request)
-        
-        # 获取客户端标识（优先级：API Key > IP地址）
-        client_id = self._get_client_id(request)
-        
-        # 检查速率限制
-        is_allowed, retry_after = rate_limiter.is_allowed(client_id)
-        
+        if not self.enabled or scope["path"] in _HEALTH_PATHS:
+            return await self.app(scope, receive, send)
+
+        # 获取客户端标识（优先级：API Key > IP地址）。
+        # 结果缓存进scope["extensions"]，同一请求的其他消费方
+        # （异常处理器、将来的审计逻辑）直接复用，不再重拼字符串
+        extensions = scope.setdefault("extensions", {})
+        client_id = extensions.get("client_id")
+        if client_id is None:
+            client_id = self._get_client_id(scope)
+            extensions["client_id"] = client_id
+
+        # 检查速率限制（一次调用同时拿到剩余配额，省去响应头的二次查询）
+        if self._distributed:
+            try:
+                is_allowed, remaining, retry_after = await redis_rate_limiter.check(client_id)
+            except Exception as e:
+                # Redis不可用时退回本进程内存桶：限流退化但服务不中断
+                logger.warning("Distributed rate limit unavailable, using local: %s", e)
+                is_allowed, remaining, retry_after = rate_limiter.check(client_id)
+        else:
+            is_allowed, remaining, retry_after = rate_limiter.check(client_id)
+
         if not is_allowed:
             logger.warning(
-                f"Rate limit exceeded for {client_id} on {request.url.path}",
+                "Rate limit exceeded for %s on %s", client_id, scope["path"],
                 extra={
                     "client_id": client_id,
-                    "path": request.url.path,
+                    "path": scope["path"],
                     "retry_after": retry_after
                 }
             )
-            
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "error": "Too many requests",
-                    "code": "rate_limit_exceeded",
-                    "retry_after": retry_after,
-                    "message": f"Rate limit exceeded. Please retry after {retry_after} seconds."
-                },
-                headers={
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Limit": str(getattr(settings, 'RATE_LIMIT_REQUESTS', 100)),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(retry_after)
-                }
-            )
-        
-        # 添加速率限制头
-        response = await call_next(request)
-        
-        # 获取剩余请求数
-        remaining = rate_limiter.get_remaining(client_id)
-        
-        response.headers["X-RateLimit-Limit"] = str(getattr(settings, 'RATE_LIMIT_REQUESTS', 100))
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Window"] = str(getattr(settings, 'RATE_LIMIT_WINDOW', 60))
-        
-        return response
-    
-    def _get_client_id(self, request: Request) -> str:
+
+            # retry_after是动态的，body无法整体预计算；
+            # 但orjson直接出bytes并手发ASGI帧，省掉Response对象和stdlib json
+            retry_bytes = str(retry_after).encode()
+            body = orjson.dumps({
+                "error": "Too many requests",
+                "code": "rate_limit_exceeded",
+                "retry_after": retry_after,
+                "message": f"Rate limit exceeded. Please retry after {retry_after} seconds."
+            })
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    *self._429_static_headers,
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", retry_bytes),
+                    (b"x-ratelimit-reset", retry_bytes),
+                ]
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            # 添加速率限制头（remaining取自准入判定时刻的值）
+            if message["type"] == "http.response.start":
+                message["headers"].extend((
+                    self._limit_header,
+                    (b"x-ratelimit-remaining", str(remaining).encode()),
+                    self._window_header,
+                ))
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _get_client_id(self, scope: Scope) -> str:
         """获取客户端标识"""
         # 优先使用API Key
-        api_key = request.headers.get("X-API-Key") or request.headers.get("Authorization")
+        api_key = _get_header(scope, b"x-api-key") or _get_header(scope, b"authorization")
         if api_key:
-            return f"key:{api_key[:8]}"  # 只使用前8个字符
-        
-        # 使用IP地址
-        client_ip = request.client.host if request.client else "unknown"
-        
-        # 检查X-Forwarded-For头（如果在代理后面）
-        forwarded_for = request.headers.get("X-Forwarded-For")
+            return f"key:{api_key[:8].decode('latin-1')}"  # 只使用前8个字符
+
+        # 检查X-Forwarded-For头（如果在代理后面）。
+        # 只需要最左边一跳：用find定位首个逗号并切片，
+        # 不像split(",")那样为链上每一跳都分配子串
+        forwarded_for = _get_header(scope, b"x-forwarded-for")
         if forwarded_for:
-            client_ip = forwarded_for.split(",")[0].strip()
-        
+            chain = forwarded_for.decode("latin-1")
+            comma = chain.find(",")
+            client_ip = (chain if comma == -1 else chain[:comma]).strip()
+        else:
+            client = scope.get("client")
+            client_ip = client[0] if client else "unknown"
+
         return f"ip:{client_ip}"
 
 
@@ -233,59 +363,86 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 # 日志中间件
 # =============================================================================
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware:
     """请求日志中间件"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # 探针端点被K8s/Prometheus持续轮询，往往是生产环境的主流量；
+        # 不产生日志记录，也省掉计时send包装
+        path = scope["path"]
+        if path in _HEALTH_PATHS:
+            return await self.app(scope, receive, send)
+
         # 记录请求开始时间
         start_time = time.time()
-        request_id = getattr(request.state, "request_id", "unknown")
-        
-        # 记录请求信息
+        method = scope["method"]
+        client = scope.get("client")
+        # 直接按键读取，避免每请求构造一个临时dict再做两级get
+        state = scope.get("state")
+        request_id = state.get("request_id", "unknown") if state is not None else "unknown"
+
+        # 记录请求信息（%s延迟格式化：级别被过滤时完全不拼字符串）
         logger.info(
-            f"Request started: {request.method} {request.url.path}",
+            "Request started: %s %s", method, path,
             extra={
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "client": request.client.host if request.client else "unknown"
+                "method": method,
+                "path": path,
+                "client": client[0] if client else "unknown"
             }
         )
-        
+
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 添加处理时间到响应头
+                process_time = time.time() - start_time
+                message["headers"].append(
+                    (b"x-process-time", f"{process_time:.4f}".encode())
+                )
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
+            await self.app(scope, receive, send_with_timing)
+
             # 计算处理时间
             process_time = time.time() - start_time
-            
+
             # 记录响应信息
             logger.info(
-                f"Request completed: {request.method} {request.url.path} - {response.status_code}",
+                "Request completed: %s %s - %s", method, path, status_code,
                 extra={
                     "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "status_code": response.status_code,
+                    "method": method,
+                    "path": path,
+                    "status_code": status_code,
                     "process_time": process_time
                 }
             )
-            
-            # 添加处理时间到响应头
-            response.headers["X-Process-Time"] = f"{process_time:.4f}"
-            
-            return response
         except Exception as e:
             process_time = time.time() - start_time
+            # 同一处异常在TTL内只格式化一次栈回溯，其余记录带指纹引用
+            format_tb, tb_fingerprint = should_format_traceback(e)
             logger.error(
-                f"Request failed: {request.method} {request.url.path} - {str(e)}",
+                "Request failed: %s %s - %s", method, path, e,
                 extra={
                     "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": method,
+                    "path": path,
                     "process_time": process_time,
-                    "error": str(e)
+                    "error": str(e),
+                    "traceback_ref": tb_fingerprint
                 },
-                exc_info=True
+                exc_info=e if format_tb else False
             )
             raise
 
@@ -294,85 +451,120 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 # 指标收集中间件
 # =============================================================================
 
-class MetricsMiddleware(BaseHTTPMiddleware):
+class MetricsMiddleware:
     """
-    线程安全的指标收集中间件
-    
-    使用锁保护计数器操作，支持高并发场景
+    指标收集中间件（无锁）
+
+    所有计数都发生在单个事件循环线程里，单条dict/属性操作在CPython下
+    本就是GIL原子的，之前每个请求三次threading.Lock纯属开销。
+    读取方（/metrics轮询）看到的是最终一致的快照，对遥测足够。
+
+    不做按线程分片：uvicorn每个worker只有一个事件循环线程在写，
+    分片和缓存行填充在CPython对象模型下既无收益也无必要，
+    反而让get_metrics多一轮归并。
     """
-    
+
     _instance: Optional['MetricsMiddleware'] = None
-    
+
+    # 路径条目上限：正常情况下按路由模板聚合远到不了这个数，
+    # 上限只是对未匹配路径（404探测等）的最后防线
+    MAX_PATH_ENTRIES = 1024
+
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self._lock = threading.Lock()
-        self._request_count = 0
-        self._error_count = 0
+        self.app = app
+        # itertools.count的__next__是C实现的单次调用，天然GIL原子，
+        # 即便未来出现多线程写入也不会丢计数
+        self._request_counter = itertools.count()
+        self._error_counter = itertools.count()
         self._total_time = 0.0
-        self._path_metrics: Dict[str, Dict[str, float]] = {}
+        self._path_metrics: Dict[str, List] = defaultdict(_new_path_stats)
         # 保存实例以便外部访问
         MetricsMiddleware._instance = self
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        path = request.url.path
-        
-        with self._lock:
-            self._request_count += 1
-        
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+
+        # 探针流量不进指标：避免/health把_path_metrics和平均耗时统计淹没
+        if path in _HEALTH_PATHS:
+            return await self.app(scope, receive, send)
+
+        # 热路径只加载一次self，后续都是局部变量访问（LOAD_FAST）
+        now = time.time
+        start_time = now()
+
+        next(self._request_counter)
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            with self._lock:
-                self._total_time += process_time
-                if response.status_code >= 400:
-                    self._error_count += 1
-                
-                # 按路径统计
-                if path not in self._path_metrics:
-                    self._path_metrics[path] = {"count": 0, "errors": 0, "total_time": 0.0}
-                self._path_metrics[path]["count"] += 1
-                self._path_metrics[path]["total_time"] += process_time
-                if response.status_code >= 400:
-                    self._path_metrics[path]["errors"] += 1
-            
-            return response
+            await self.app(scope, receive, send_with_status)
+            process_time = now() - start_time
+
+            self._total_time += process_time
+
+            # 路由匹配后用模板聚合（/items/{id}而非/items/42），
+            # 避免路径参数把_path_metrics撑到无界；未匹配的原始路径
+            # 归并到一个桶里，防止随机URL探测造成泄漏
+            route = scope.get("route")
+            if route is not None:
+                # path_format是规范化模板（挂载子应用时path会带挂载前缀差异）
+                path = route.path_format
+            elif len(self._path_metrics) >= self.MAX_PATH_ENTRIES:
+                path = "_unmatched"
+
+            # 按路径统计（defaultdict的__missing__是单次C级调用）
+            path_stats = self._path_metrics[path]
+            path_stats[0] += 1
+            path_stats[2] += process_time
+            if status_code >= 400:
+                next(self._error_counter)
+                path_stats[1] += 1
         except Exception:
-            process_time = time.time() - start_time
-            with self._lock:
-                self._error_count += 1
-                self._total_time += process_time
+            process_time = now() - start_time
+            next(self._error_counter)
+            self._total_time += process_time
             raise
-    
+
     def get_metrics(self) -> dict:
-        """获取指标（线程安全）"""
-        with self._lock:
-            avg_time = self._total_time / self._request_count if self._request_count > 0 else 0
-            error_rate = self._error_count / self._request_count if self._request_count > 0 else 0
-            
-            return {
-                "total_requests": self._request_count,
-                "total_errors": self._error_count,
-                "error_rate": round(error_rate, 4),
-                "avg_process_time": round(avg_time, 4),
-                "paths": {
-                    path: {
-                        "count": m["count"],
-                        "errors": m["errors"],
-                        "avg_time": round(m["total_time"] / m["count"], 4) if m["count"] > 0 else 0
-                    }
-                    for path, m in self._path_metrics.items()
+        """获取指标（最终一致的快照）"""
+        request_count = _peek(self._request_counter)
+        error_count = _peek(self._error_counter)
+        total_time = self._total_time
+
+        avg_time = total_time / request_count if request_count > 0 else 0
+        error_rate = error_count / request_count if request_count > 0 else 0
+
+        return {
+            "total_requests": request_count,
+            "total_errors": error_count,
+            "error_rate": round(error_rate, 4),
+            "avg_process_time": round(avg_time, 4),
+            "paths": {
+                path: {
+                    "count": m[0],
+                    "errors": m[1],
+                    "avg_time": round(m[2] / m[0], 4) if m[0] > 0 else 0
                 }
+                # list()快照避免遍历时字典被新路径扩容
+                for path, m in list(self._path_metrics.items())
             }
-    
+        }
+
     def reset_metrics(self) -> None:
         """重置指标（用于测试）"""
-        with self._lock:
-            self._request_count = 0
-            self._error_count = 0
-            self._total_time = 0.0
-            self._path_metrics.clear()
+        self._request_counter = itertools.count()
+        self._error_counter = itertools.count()
+        self._total_time = 0.0
+        self._path_metrics.clear()
 
 
 # =============================================================================
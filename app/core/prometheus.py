@@ -1,7 +1,8 @@
 """
 Prometheus指标集成
 """
-from typing import Optional
+import asyncio
+from typing import Dict, Optional, Tuple
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, REGISTRY
 from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST
 from starlette.requests import Request
@@ -104,14 +105,101 @@ rate_limit_exceeded_total = Counter(
 )
 
 
+# 状态码归并为状态类（2xx/4xx/5xx）：既压低标签基数，
+# 也让预绑定的子指标表保持很小
+_STATUS_CLASSES = ("0xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+
+# (method, endpoint, status_class) -> 预绑定的子指标。
+# .labels(...)每次都要拼标签元组再查prometheus_client的内部字典；
+# 首次绑定后缓存child对象，热路径只剩一次本地dict查找加.inc()/.observe()
+_request_children: Dict[Tuple[str, str, str], tuple] = {}
+
+
+def _bind_children(key: Tuple[str, str, str]) -> tuple:
+    """绑定并缓存(key对应的Counter子指标, Histogram子指标)"""
+    method, endpoint, status_class = key
+    children = (
+        http_requests_total.labels(
+            method=method, endpoint=endpoint, status=status_class
+        ),
+        http_request_duration_seconds.labels(method=method, endpoint=endpoint),
+    )
+    _request_children[key] = children
+    return children
+
+
+# 请求指标的批量缓冲：.inc()/.observe()每次都要过prometheus_client
+# 内部的互斥锁，这里请求路径只做一次无锁的dict追加，由后台任务每100ms
+# 统一回放（计数合并为单次inc(n)）。以约100ms的指标新鲜度换取热路径
+# 上零锁操作。记录只发生在事件循环线程，普通dict换出即可，无需线程本地。
+# 刷新任务未启动时（脚本、同步调用方）退化为直接记录。
+_FLUSH_INTERVAL = 0.1
+# key -> [请求数, 时延列表]
+_pending_requests: Dict[Tuple[str, str, str], list] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+
+def _flush_pending() -> None:
+    """把缓冲的观测值回放到真正的Prometheus指标上"""
+    global _pending_requests
+    if not _pending_requests:
+        return
+    batch, _pending_requests = _pending_requests, {}
+    for key, (count, durations) in batch.items():
+        children = _request_children.get(key)
+        if children is None:
+            children = _bind_children(key)
+        children[0].inc(count)
+        observe = children[1].observe
+        for duration in durations:
+            observe(duration)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(_FLUSH_INTERVAL)
+        _flush_pending()
+
+
+def start_metrics_flush() -> None:
+    """在当前事件循环上启动指标刷新任务（幂等）"""
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+def stop_metrics_flush() -> None:
+    """停止指标刷新任务并排空残余缓冲"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    _flush_pending()
+
+
 class PrometheusMetrics:
     """Prometheus指标管理器"""
-    
+
     @staticmethod
     def record_request(method: str, endpoint: str, status: int, duration: float):
         """记录HTTP请求"""
-        http_requests_total.labels(method=method, endpoint=endpoint, status=status).inc()
-        http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
+        status_class = _STATUS_CLASSES[status // 100] if 100 <= status < 600 else str(status)
+        key = (method, endpoint, status_class)
+
+        if _flush_task is not None:
+            entry = _pending_requests.get(key)
+            if entry is None:
+                _pending_requests[key] = [1, [duration]]
+            else:
+                entry[0] += 1
+                entry[1].append(duration)
+            return
+
+        children = _request_children.get(key)
+        if children is None:
+            children = _bind_children(key)
+        children[0].inc()
+        children[1].observe(duration)
     
     @staticmethod
     def record_llm_request(provider: str, model: str, status: str, duration: float, 
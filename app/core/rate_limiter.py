@@ -2,10 +2,19 @@
 速率限制器 - 防止API滥用
 """
 import time
-from typing import Dict, Optional
-from collections import defaultdict
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 from app.core.logging import logger
+from app.core.timeutils import cached_monotonic
+
+# 缓存单调时钟：窗口按秒计，20ms分辨率绰绰有余，
+# 高QPS下免去每次准入判定的vDSO时钟调用；
+# 对系统时钟回拨同样免疫（底层是time.monotonic）
+_now = cached_monotonic
+
+# 客户端表的高水位：超过后在新客户端写入时顺手做一次惰性清理，
+# 不依赖外部定时器也能把随机client_id造成的膨胀压回去
+_CLIENT_HIGH_WATER = 100_000
 
 
 @dataclass
@@ -13,7 +22,7 @@ class RateLimitRule:
     """速率限制规则"""
     requests: int  # 允许的请求数
     window: int  # 时间窗口（秒）
-    
+
     def __str__(self):
         return f"{self.requests} requests per {self.window}s"
 
@@ -21,82 +30,119 @@ class RateLimitRule:
 class RateLimiter:
     """
     基于内存的速率限制器
-    
-    使用滑动窗口算法跟踪请求
+
+    使用令牌桶算法：每客户端只保存(剩余令牌数, 上次补充时刻)两个浮点数，
+    准入判定是纯算术O(1)——不再像滑动窗口那样维护并反复清理时间戳队列。
+    令牌以 requests/window 的速率匀速补充，桶容量为requests，
+    与滑动窗口在窗口尺度上等效且允许相同的突发量。
     注意：这是单进程实现，生产环境建议使用Redis实现分布式限流
     """
-    
+
     def __init__(self):
-        # 存储每个客户端的请求时间戳
-        # key: client_id, value: list of timestamps
-        self._requests: Dict[str, list] = defaultdict(list)
-        
+        # 每个客户端的桶状态
+        # key: client_id, value: [tokens, last_refill]（list便于原地更新）
+        self._requests: Dict[str, List[float]] = {}
+
         # 默认规则
         self._default_rule = RateLimitRule(requests=100, window=60)
-        
+
         # 自定义规则
         self._custom_rules: Dict[str, RateLimitRule] = {}
-    
+
+        # 维护的统计计数器（热路径递增，读取无需遍历）
+        self._total_requests = 0
+        self._rejected_requests = 0
+
     def set_default_rule(self, requests: int, window: int):
         """设置默认规则"""
         self._default_rule = RateLimitRule(requests, window)
         logger.info(f"Rate limit default rule set: {self._default_rule}")
-    
+
     def set_rule(self, client_id: str, requests: int, window: int):
         """为特定客户端设置规则"""
         self._custom_rules[client_id] = RateLimitRule(requests, window)
         logger.info(f"Rate limit rule set for {client_id}: {self._custom_rules[client_id]}")
-    
-    def is_allowed(self, client_id: str) -> tuple[bool, Optional[int]]:
+
+    def check(self, client_id: str) -> tuple[bool, int, Optional[int]]:
         """
-        检查是否允许请求
-        
+        检查并记录一次请求，同时给出剩余配额
+
+        中间件既要判断是否放行又要发x-ratelimit-remaining头，
+        合并成一次调用免去二次查询
+
         Args:
             client_id: 客户端标识（IP地址、用户ID、API Key等）
-        
+
         Returns:
-            (is_allowed, retry_after): 是否允许和重试时间（秒）
+            (is_allowed, remaining, retry_after): 是否允许、剩余配额、重试时间（秒）
         """
-        current_time = time.time()
-        
+        current_time = _now()
+
         # 获取适用的规则
         rule = self._custom_rules.get(client_id, self._default_rule)
-        
-        # 获取该客户端的请求历史
-        request_times = self._requests[client_id]
-        
-        # 清理过期的请求记录（超出时间窗口）
-        cutoff_time = current_time - rule.window
-        request_times[:] = [t for t in request_times if t > cutoff_time]
-        
-        # 检查是否超过限制
-        if len(request_times) >= rule.requests:
-            # 计算需要等待的时间
-            oldest_request = request_times[0]
-            retry_after = int(oldest_request + rule.window - current_time) + 1
-            
+
+        self._total_requests += 1
+
+        bucket = self._requests.get(client_id)
+        if bucket is None:
+            # 新客户端：满桶起步，消耗一个令牌。
+            # 表过大时先惰性驱逐不活跃客户端（只在新增路径触发，
+            # 不影响既有客户端的纯算术热路径）
+            if len(self._requests) >= _CLIENT_HIGH_WATER:
+                self.cleanup(max_age=self._default_rule.window * 2)
+            self._requests[client_id] = [rule.requests - 1.0, current_time]
+            return True, rule.requests - 1, None
+
+        # 按流逝时间匀速补充令牌（容量封顶）
+        tokens = bucket[0] + (current_time - bucket[1]) * rule.requests / rule.window
+        if tokens > rule.requests:
+            tokens = float(rule.requests)
+        bucket[1] = current_time
+
+        if tokens < 1.0:
+            bucket[0] = tokens
+            self._rejected_requests += 1
+            # 凑满一个令牌所需的时间
+            retry_after = int((1.0 - tokens) * rule.window / rule.requests) + 1
+
             logger.warning(
                 f"Rate limit exceeded for {client_id}: "
-                f"{len(request_times)}/{rule.requests} in {rule.window}s window"
+                f"0/{rule.requests} tokens in {rule.window}s window"
             )
-            return False, retry_after
-        
-        # 记录本次请求
-        request_times.append(current_time)
-        
-        return True, None
-    
+            return False, 0, retry_after
+
+        bucket[0] = tokens - 1.0
+        return True, int(tokens - 1.0), None
+
+    def is_allowed(self, client_id: str) -> tuple[bool, Optional[int]]:
+        """
+        检查是否允许请求
+
+        Args:
+            client_id: 客户端标识（IP地址、用户ID、API Key等）
+
+        Returns:
+            (is_allowed, retry_after): 是否允许和重试时间（秒）
+        """
+        allowed, _, retry_after = self.check(client_id)
+        return allowed, retry_after
+
+    def active_clients(self) -> int:
+        """获取当前跟踪的客户端数量（O(1)，不遍历内部结构）"""
+        return len(self._requests)
+
     def get_remaining(self, client_id: str) -> int:
-        """获取剩余可用请求数"""
-        current_time = time.time()
+        """获取剩余可用请求数（不消耗令牌）"""
         rule = self._custom_rules.get(client_id, self._default_rule)
-        
-        request_times = self._requests[client_id]
-        cutoff_time = current_time - rule.window
-        valid_requests = [t for t in request_times if t > cutoff_time]
-        
-        return max(0, rule.requests - len(valid_requests))
-    
+        bucket = self._requests.get(client_id)
+        if bucket is None:
+            return rule.requests
+
+        tokens = bucket[0] + (_now() - bucket[1]) * rule.requests / rule.window
+        if tokens > rule.requests:
+            tokens = float(rule.requests)
+        return max(0, int(tokens))
+
     def reset(self, client_id: Optional[str] = None):
         """重置限流器"""
         if client_id:
@@ -105,61 +151,129 @@ class RateLimiter:
         else:
             self._requests.clear()
             logger.info("Rate limit reset for all clients")
-    
+
     def cleanup(self, max_age: int = 3600) -> int:
         """
         清理过期的客户端记录
-        
+
         Args:
             max_age: 最大保留时间（秒）
-            
+
         Returns:
             清理的客户端数量
         """
-        current_time = time.time()
-        cutoff_time = current_time - max_age
-        
-        clients_to_remove = []
-        for client_id, request_times in self._requests.items():
-            # 如果客户端最后一次请求是很久以前，则删除
-            if not request_times or max(request_times) < cutoff_time:
-                clients_to_remove.append(client_id)
-        
+        cutoff_time = _now() - max_age
+
+        clients_to_remove = [
+            client_id for client_id, bucket in self._requests.items()
+            # 桶的last_refill即该客户端最后一次请求时刻
+            if bucket[1] < cutoff_time
+        ]
+
         for client_id in clients_to_remove:
             del self._requests[client_id]
-        
+
         if clients_to_remove:
             logger.info(f"Cleaned up {len(clients_to_remove)} inactive clients from rate limiter")
-        
+
         return len(clients_to_remove)
-    
+
     def get_stats(self) -> dict:
         """
         获取速率限制器统计信息
-        
+
         Returns:
             统计信息字典
         """
-        current_time = time.time()
+        current_time = _now()
         active_clients = 0
-        total_requests = 0
-        
-        for client_id, request_times in self._requests.items():
-            cutoff_time = current_time - self._default_rule.window
-            valid_requests = [t for t in request_times if t > cutoff_time]
-            if valid_requests:
+        consumed_tokens = 0
+
+        default_window = self._default_rule.window
+        for client_id, bucket in self._requests.items():
+            if current_time - bucket[1] <= default_window:
                 active_clients += 1
-                total_requests += len(valid_requests)
-        
+                rule = self._custom_rules.get(client_id, self._default_rule)
+                consumed_tokens += max(0, int(rule.requests - bucket[0]))
+
         return {
             "active_clients": active_clients,
-            "total_requests_in_window": total_requests,
+            "total_requests_in_window": consumed_tokens,
+            "total_requests": self._total_requests,
+            "rejected_requests": self._rejected_requests,
             "default_limit": self._default_rule.requests,
             "default_window": self._default_rule.window,
             "custom_rules_count": len(self._custom_rules)
         }
 
 
+# Redis服务端令牌桶脚本：读取-补充-扣减-回写在单个Lua调用里原子完成，
+# 每次准入判定只有一个RTT。时钟取自Redis TIME，多worker间无钟差。
+# 返回 {allowed, remaining, retry_after}
+_TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = t[1] + t[2] / 1000000
+local rate = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = rate
+else
+    tokens = math.min(rate, tokens + (now - tonumber(bucket[2])) * rate / window)
+end
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) * window / rate)
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {allowed, math.floor(tokens), retry}
+"""
+
+
+class RedisRateLimiter:
+    """
+    Redis分布式速率限制器
+
+    多worker部署时每个进程各自维护内存桶会导致配额按worker数放大；
+    这里把桶放进Redis，由Lua脚本服务端原子执行补充和扣减。
+    register_script自动走EVALSHA并在脚本未加载时回退EVAL加载。
+    """
+
+    def __init__(self):
+        self._script = None
+
+    async def check(self, client_id: str) -> tuple[bool, int, Optional[int]]:
+        """
+        检查并记录一次请求（与RateLimiter.check同构的返回值）
+
+        Args:
+            client_id: 客户端标识
+
+        Returns:
+            (is_allowed, remaining, retry_after)
+        """
+        from app.core.connections import RedisConnectionPool
+
+        client = await RedisConnectionPool.get_client()
+        if self._script is None:
+            self._script = client.register_script(_TOKEN_BUCKET_LUA)
+
+        rule = rate_limiter._custom_rules.get(client_id, rate_limiter._default_rule)
+        allowed, remaining, retry_after = await self._script(
+            keys=[f"ratelimit:{client_id}"],
+            args=[rule.requests, rule.window],
+        )
+        if allowed:
+            return True, int(remaining), None
+        return False, 0, int(retry_after)
+
+
 # 全局速率限制器实例
 rate_limiter = RateLimiter()
-
+redis_rate_limiter = RedisRateLimiter()
@@ -4,6 +4,7 @@
 提供可配置的重试策略和断路器模式，用于处理瞬时故障
 """
 import asyncio
+import threading
 import time
 import random
 from typing import Callable, TypeVar, Optional, Any, Tuple, Type, Union, overload
@@ -53,20 +54,6 @@ class RetryConfig:
             raise ValueError("exponential_base must be >= 1")
 
 
-def _calculate_delay(config: RetryConfig, attempt: int) -> float:
-    """计算延迟时间（带指数退避和可选抖动）"""
-    delay = min(
-        config.initial_delay * (config.exponential_base ** attempt),
-        config.max_delay
-    )
-    
-    if config.jitter:
-        # 添加 0.5-1.0 的随机因子
-        delay = delay * (0.5 + random.random() * 0.5)
-    
-    return delay
-
-
 def retry_with_backoff(
     config: Optional[RetryConfig] = None,
     exceptions: Tuple[Type[Exception], ...] = (Exception,),
@@ -95,79 +82,99 @@ def retry_with_backoff(
     """
     if config is None:
         config = RetryConfig()
-    
+
+    # 配置在装饰时就已固定：把指数退避的确定部分（pow加min钳位）
+    # 一次性预计算成元组，重试热路径上每次只剩乘一个抖动因子
+    base_delays = tuple(
+        min(config.initial_delay * config.exponential_base ** i, config.max_delay)
+        for i in range(config.max_retries)
+    )
+
     def decorator(func: F) -> F:
-        @wraps(func)
-        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
-            last_error: Optional[Exception] = None
-            
-            for attempt in range(config.max_retries + 1):
-                try:
-                    return await func(*args, **kwargs)
-                except exceptions as e:
-                    last_error = e
-                    if attempt < config.max_retries:
-                        wait_time = _calculate_delay(config, attempt)
-                        
-                        if on_retry:
-                            on_retry(e, attempt + 1)
+        # 装饰时只构造实际需要的那个包装器（每次装饰少建一个闭包），
+        # 并把循环内反复读取的配置项绑定为闭包局部变量
+        max_retries = config.max_retries
+        jitter = config.jitter
+        func_name = func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                last_error: Optional[Exception] = None
+
+                for attempt in range(max_retries + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as e:
+                        last_error = e
+                        if attempt < max_retries:
+                            wait_time = base_delays[attempt]
+                            if jitter:
+                                # 添加 0.5-1.0 的随机因子
+                                wait_time *= 0.5 + random.random() * 0.5
+
+                            if on_retry:
+                                on_retry(e, attempt + 1)
+                            else:
+                                logger.warning(
+                                    "Retry %d/%d for %s: %s: %s",
+                                    attempt + 1, max_retries, func_name,
+                                    type(e).__name__, e
+                                )
+
+                            await asyncio.sleep(wait_time)
                         else:
-                            logger.warning(
-                                f"Retry {attempt + 1}/{config.max_retries} for "
-                                f"{func.__name__}: {type(e).__name__}: {str(e)}"
+                            logger.error(
+                                "Max retries (%d) exceeded for %s: %s: %s",
+                                max_retries, func_name, type(e).__name__, e
                             )
-                        
-                        await asyncio.sleep(wait_time)
-                    else:
-                        logger.error(
-                            f"Max retries ({config.max_retries}) exceeded for "
-                            f"{func.__name__}: {type(e).__name__}: {str(e)}"
-                        )
-            
-            # 所有重试都失败，抛出最后一个错误
-            if last_error is not None:
-                raise last_error
-            # 理论上不会到达这里，但为了类型安全
-            raise RuntimeError(f"Unexpected error in retry logic for {func.__name__}")
-        
+
+                # 所有重试都失败，抛出最后一个错误
+                if last_error is not None:
+                    raise last_error
+                # 理论上不会到达这里，但为了类型安全
+                raise RuntimeError(f"Unexpected error in retry logic for {func_name}")
+
+            return async_wrapper  # type: ignore
+
         @wraps(func)
         def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
             last_error: Optional[Exception] = None
-            
-            for attempt in range(config.max_retries + 1):
+
+            for attempt in range(max_retries + 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
                     last_error = e
-                    if attempt < config.max_retries:
-                        wait_time = _calculate_delay(config, attempt)
-                        
+                    if attempt < max_retries:
+                        wait_time = base_delays[attempt]
+                        if jitter:
+                            # 添加 0.5-1.0 的随机因子
+                            wait_time *= 0.5 + random.random() * 0.5
+
                         if on_retry:
                             on_retry(e, attempt + 1)
                         else:
                             logger.warning(
-                                f"Retry {attempt + 1}/{config.max_retries} for "
-                                f"{func.__name__}: {type(e).__name__}: {str(e)}"
+                                "Retry %d/%d for %s: %s: %s",
+                                attempt + 1, max_retries, func_name,
+                                type(e).__name__, e
                             )
-                        
+
                         time.sleep(wait_time)
                     else:
                         logger.error(
-                            f"Max retries ({config.max_retries}) exceeded for "
-                            f"{func.__name__}: {type(e).__name__}: {str(e)}"
+                            "Max retries (%d) exceeded for %s: %s: %s",
+                            max_retries, func_name, type(e).__name__, e
                         )
-            
+
             # 所有重试都失败，抛出最后一个错误
             if last_error is not None:
                 raise last_error
-            raise RuntimeError(f"Unexpected error in retry logic for {func.__name__}")
-        
-        # 根据函数类型返回对应的包装器
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper  # type: ignore
-        else:
-            return sync_wrapper  # type: ignore
-    
+            raise RuntimeError(f"Unexpected error in retry logic for {func_name}")
+
+        return sync_wrapper  # type: ignore
+
     return decorator
 
 
@@ -214,36 +221,54 @@ class CircuitBreaker:
         self.failure_count = 0
         self.last_failure_time: Optional[float] = None
         self._state = self.STATE_CLOSED
+        # 只保护状态转换；CLOSED热路径和成功路径刻意不加锁——
+        # 单次属性读写在CPython下由GIL保证原子，被保护的调用又可能
+        # 经run_in_executor跑在线程池线程上，不能让它们都排队过锁
+        self._lock = threading.Lock()
     
     @property
     def state(self) -> str:
         """获取当前状态"""
         return self._state
     
-    def _should_allow_request(self) -> bool:
-        """检查是否应该允许请求"""
+    def _should_allow_request(self, now: Optional[float] = None) -> bool:
+        """检查是否应该允许请求
+
+        Args:
+            now: 调用方已读取的time.monotonic()时刻，省去重复取钟
+        """
+        # 无锁快路径：CLOSED状态下只有一次属性读
         if self._state == self.STATE_CLOSED:
             return True
-        
-        if self._state == self.STATE_OPEN:
-            if self.last_failure_time is None:
-                return True
-            
-            elapsed = time.time() - self.last_failure_time
-            if elapsed > self.recovery_timeout:
-                self._state = self.STATE_HALF_OPEN
-                logger.info(
-                    f"Circuit breaker transitioning to HALF_OPEN "
-                    f"after {elapsed:.1f}s"
-                )
-                return True
-            return False
-        
-        # HALF_OPEN: 允许一个请求通过
-        return True
+
+        # 慢路径才加锁：防止并发请求同时观察到超时并重复触发
+        # OPEN -> HALF_OPEN转换（多放行、重复打日志）
+        with self._lock:
+            if self._state == self.STATE_OPEN:
+                if self.last_failure_time is None:
+                    return True
+
+                if now is None:
+                    now = time.monotonic()
+                elapsed = now - self.last_failure_time
+                if elapsed > self.recovery_timeout:
+                    self._state = self.STATE_HALF_OPEN
+                    logger.info(
+                        f"Circuit breaker transitioning to HALF_OPEN "
+                        f"after {elapsed:.1f}s"
+                    )
+                    return True
+                return False
+
+            # HALF_OPEN（或刚被并发成功调用关回CLOSED）: 允许请求通过
+            return True
     
     def record_success(self) -> None:
-        """记录成功调用"""
+        """记录成功调用
+
+        刻意不加锁：两个分支都只做单次赋值（CPython下GIL保证原子），
+        最坏情况是与并发失败竞争时少归零一次计数，不影响状态机正确性
+        """
         if self._state == self.STATE_HALF_OPEN:
             self._state = self.STATE_CLOSED
             self.failure_count = 0
@@ -252,19 +277,28 @@ class CircuitBreaker:
             # 成功时重置失败计数
             self.failure_count = 0
     
-    def record_failure(self) -> None:
-        """记录失败调用"""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self._state == self.STATE_HALF_OPEN:
-            self._state = self.STATE_OPEN
-            logger.warning("Circuit breaker re-opened after failure in half-open state")
-        elif self.failure_count >= self.failure_threshold:
-            self._state = self.STATE_OPEN
-            logger.error(
-                f"Circuit breaker opened after {self.failure_count} failures"
-            )
+    def record_failure(self, now: Optional[float] = None) -> None:
+        """记录失败调用
+
+        Args:
+            now: 调用方已读取的time.monotonic()时刻，省去重复取钟
+        """
+        # 失败路径整体加锁：failure_count += 1是读改写三步操作，
+        # 线程池里并发失败时无锁会丢计数或重复触发打开转换
+        with self._lock:
+            self.failure_count += 1
+            # monotonic不受NTP校时/手动改钟影响——墙钟回拨会让OPEN状态的
+            # elapsed变成负数，从而错误地把断路器卡在打开状态
+            self.last_failure_time = time.monotonic() if now is None else now
+
+            if self._state == self.STATE_HALF_OPEN:
+                self._state = self.STATE_OPEN
+                logger.warning("Circuit breaker re-opened after failure in half-open state")
+            elif self.failure_count >= self.failure_threshold:
+                self._state = self.STATE_OPEN
+                logger.error(
+                    f"Circuit breaker opened after {self.failure_count} failures"
+                )
     
     def can_execute(self) -> bool:
         """检查是否可以执行（用于速率限制测试兼容性）"""
@@ -286,18 +320,18 @@ class CircuitBreaker:
             CircuitBreakerError: 断路器打开时
             expected_exception: 函数抛出的异常
         """
-        if not self._should_allow_request():
+        if not self._should_allow_request(time.monotonic()):
             raise CircuitBreakerError(
                 f"Circuit breaker is OPEN. "
                 f"Will retry after {self.recovery_timeout}s"
             )
-        
+
         try:
             result = func(*args, **kwargs)
             self.record_success()
             return result
         except self.expected_exception:
-            self.record_failure()
+            self.record_failure(time.monotonic())
             raise
     
     async def call_async(
@@ -309,18 +343,18 @@ class CircuitBreaker:
         """
         异步执行函数，应用断路器逻辑
         """
-        if not self._should_allow_request():
+        if not self._should_allow_request(time.monotonic()):
             raise CircuitBreakerError(
                 f"Circuit breaker is OPEN. "
                 f"Will retry after {self.recovery_timeout}s"
             )
-        
+
         try:
             result = await func(*args, **kwargs)
             self.record_success()
             return result
         except self.expected_exception:
-            self.record_failure()
+            self.record_failure(time.monotonic())
             raise
     
     def reset(self) -> None:
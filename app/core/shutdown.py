@@ -5,7 +5,7 @@
 """
 import asyncio
 import signal
-from typing import Callable, List, Awaitable, Optional
+from typing import Callable, List, Awaitable, Optional, Tuple
 from app.core.logging import logger
 
 
@@ -18,19 +18,25 @@ class ShutdownManager:
     """
     
     def __init__(self) -> None:
-        self._cleanup_tasks: List[Callable[[], Awaitable[None]]] = []
+        # (优先级, 清理函数)：高优先级层先执行，同层内并发运行
+        self._cleanup_tasks: List[Tuple[int, Callable[[], Awaitable[None]]]] = []
         self._is_shutting_down = False
         self._shutdown_timeout = 30.0  # 秒
     
-    def register(self, cleanup_func: Callable[[], Awaitable[None]]) -> None:
+    def register(
+        self,
+        cleanup_func: Callable[[], Awaitable[None]],
+        priority: int = 0
+    ) -> None:
         """
         注册清理函数
         
         Args:
             cleanup_func: 异步清理函数
+            priority: 执行层级，数值大的层先执行；同层任务并发执行
         """
-        self._cleanup_tasks.append(cleanup_func)
-        logger.debug(f"Registered cleanup task: {cleanup_func.__name__}")
+        self._cleanup_tasks.append((priority, cleanup_func))
+        logger.debug(f"Registered cleanup task: {cleanup_func.__name__} (priority={priority})")
     
     def set_timeout(self, timeout: float) -> None:
         """设置关闭超时时间"""
@@ -52,18 +58,29 @@ class ShutdownManager:
         self._is_shutting_down = True
         logger.info(f"Starting graceful shutdown with {len(self._cleanup_tasks)} tasks...")
         
-        # 逆序执行清理任务（后注册的先清理）
-        for task in reversed(self._cleanup_tasks):
+        # 按层级从高到低分组；层内任务（Redis、缓存、向量库等相互独立的
+        # 资源）用gather并发清理，总耗时从sum(任务耗时)降到max(任务耗时)，
+        # 且每层共享完整的超时预算而非按任务数均分
+        tiers = sorted({priority for priority, _ in self._cleanup_tasks}, reverse=True)
+        for tier in tiers:
+            tasks = [func for priority, func in self._cleanup_tasks if priority == tier]
             try:
-                logger.debug(f"Running cleanup task: {task.__name__}")
-                await asyncio.wait_for(
-                    task(),
-                    timeout=self._shutdown_timeout / len(self._cleanup_tasks) if self._cleanup_tasks else 10
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(task() for task in tasks), return_exceptions=True),
+                    timeout=self._shutdown_timeout
                 )
             except asyncio.TimeoutError:
-                logger.warning(f"Cleanup task {task.__name__} timed out")
-            except Exception as e:
-                logger.error(f"Error in cleanup task {task.__name__}: {e}", exc_info=True)
+                logger.warning(
+                    f"Cleanup tier {tier} timed out "
+                    f"({', '.join(task.__name__ for task in tasks)})"
+                )
+                continue
+            for task, result in zip(tasks, results):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        f"Error in cleanup task {task.__name__}: {result}",
+                        exc_info=result
+                    )
         
         logger.info("Graceful shutdown completed")
     
@@ -7,81 +7,86 @@ from abc import ABC
 
 T = TypeVar('T', bound='ThreadSafeSingleton')
 
+# 仅用于首次为某个类挂锁的短临界区
+_init_lock = threading.Lock()
+
+# 实例与锁直接存成类自身的属性（不会被子类经MRO继承，
+# 读取用cls.__dict__.get保证只命中本类）。相比挂在基类的共享
+# _instances字典上：快速路径少一次跨所有单例类竞争的dict查找，
+# 且C层的类属性访问即可完成
+_INSTANCE_ATTR = "__singleton_instance__"
+_LOCK_ATTR = "__singleton_lock__"
+
+
+def _get_or_create(cls: type, factory: Any, args: tuple, kwargs: dict) -> Any:
+    """双重检查锁定的慢路径：为cls创建并缓存唯一实例"""
+    lock = cls.__dict__.get(_LOCK_ATTR)
+    if lock is None:
+        with _init_lock:
+            lock = cls.__dict__.get(_LOCK_ATTR)
+            if lock is None:
+                lock = threading.Lock()
+                setattr(cls, _LOCK_ATTR, lock)
+
+    with lock:
+        instance = cls.__dict__.get(_INSTANCE_ATTR)
+        if instance is None:
+            instance = factory(*args, **kwargs)
+            setattr(cls, _INSTANCE_ATTR, instance)
+        return instance
+
 
 class ThreadSafeSingleton(ABC):
     """
     线程安全的单例基类
-    
+
     使用双重检查锁定模式确保线程安全
     """
-    _instances: Dict[Type, Any] = {}
-    _locks: Dict[Type, threading.Lock] = {}
-    _init_lock = threading.Lock()
-    
+
     def __new__(cls: Type[T], *args: Any, **kwargs: Any) -> T:
-        # 快速路径：如果实例已存在，直接返回
-        if cls in cls._instances:
-            return cls._instances[cls]
-        
-        # 确保每个类有自己的锁
-        with cls._init_lock:
-            if cls not in cls._locks:
-                cls._locks[cls] = threading.Lock()
-        
-        # 双重检查锁定
-        with cls._locks[cls]:
-            if cls not in cls._instances:
-                instance = super().__new__(cls)
-                cls._instances[cls] = instance
-            return cls._instances[cls]
-    
+        # 快速路径：如果实例已存在，直接返回（一次本类__dict__查找）
+        instance = cls.__dict__.get(_INSTANCE_ATTR)
+        if instance is not None:
+            return instance
+
+        return _get_or_create(cls, super().__new__, (cls,), {})
+
     @classmethod
     def reset_instance(cls) -> None:
         """
         重置单例实例（用于测试）
         """
-        with cls._init_lock:
-            if cls in cls._instances:
-                del cls._instances[cls]
-            if cls in cls._locks:
-                del cls._locks[cls]
-    
+        with _init_lock:
+            if _INSTANCE_ATTR in cls.__dict__:
+                delattr(cls, _INSTANCE_ATTR)
+            if _LOCK_ATTR in cls.__dict__:
+                delattr(cls, _LOCK_ATTR)
+
     @classmethod
     def get_instance(cls: Type[T]) -> Optional[T]:
         """
         获取现有实例（不创建新实例）
         """
-        return cls._instances.get(cls)
-    
+        return cls.__dict__.get(_INSTANCE_ATTR)
+
     @classmethod
     def is_initialized(cls) -> bool:
         """
         检查是否已初始化
         """
-        return cls in cls._instances
+        return _INSTANCE_ATTR in cls.__dict__
 
 
 class SingletonMeta(type):
     """
     单例元类 - 另一种实现方式
-    
+
     适用于不能继承ThreadSafeSingleton的情况
     """
-    _instances: Dict[Type, Any] = {}
-    _locks: Dict[Type, threading.Lock] = {}
-    _init_lock = threading.Lock()
-    
+
     def __call__(cls, *args: Any, **kwargs: Any) -> Any:
-        if cls in cls._instances:
-            return cls._instances[cls]
-        
-        with cls._init_lock:
-            if cls not in cls._locks:
-                cls._locks[cls] = threading.Lock()
-        
-        with cls._locks[cls]:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-            return cls._instances[cls]
+        instance = cls.__dict__.get(_INSTANCE_ATTR)
+        if instance is not None:
+            return instance
 
+        return _get_or_create(cls, super().__call__, args, kwargs)
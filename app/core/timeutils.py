@@ -0,0 +1,87 @@
+"""
+时间工具 - 低开销的UTC时间戳与缓存时钟
+
+datetime.utcnow()已弃用且每次调用都要分配对象并走格式化代码，
+对于/stats、/health、/metrics这类高频轮询端点是可观的CPU浪费。
+这里维护一个约100ms分辨率的缓存ISO字符串，命中时仅做一次整除比较。
+
+另提供一个事件循环级缓存的单调时钟（cached_monotonic）：后台任务
+定期刷新一个浮点数，读取方只做一次全局变量加载，省掉vDSO时钟调用。
+只适用于能容忍几十毫秒误差的场景（如按秒计的限流窗口），
+不可用于请求耗时统计这类需要真实时长的测量。
+"""
+import asyncio
+import time
+from typing import Optional
+from datetime import datetime, timezone
+
+# 缓存分辨率：100ms（时间戳本身只精确到秒，100ms刷新绰绰有余）
+_BUCKET_NS = 100_000_000
+
+_cached_bucket: int = -1
+_cached_iso: str = ""
+
+
+def utc_now_iso() -> str:
+    """
+    获取当前UTC时间的ISO 8601字符串（如 2026-01-01T00:00:00Z）
+
+    timespec="seconds"跳过微秒格式化，约快2倍；
+    100ms内的重复调用直接返回缓存字符串，不分配datetime对象。
+    竞态是良性的：并发刷新只会重复一次格式化，结果相同。
+    """
+    global _cached_bucket, _cached_iso
+
+    bucket = time.time_ns() // _BUCKET_NS
+    if bucket != _cached_bucket:
+        _cached_iso = datetime.now(timezone.utc).isoformat(
+            timespec="seconds"
+        ).replace("+00:00", "Z")
+        _cached_bucket = bucket
+    return _cached_iso
+
+
+# ---------------------------------------------------------------------------
+# 缓存单调时钟
+# ---------------------------------------------------------------------------
+
+_CLOCK_INTERVAL = 0.02  # 刷新周期20ms：对秒级窗口的误差可忽略
+
+_cached_monotonic: float = 0.0
+_clock_task: Optional[asyncio.Task] = None
+
+
+def cached_monotonic() -> float:
+    """
+    获取缓存的单调时间（约20ms分辨率）
+
+    时钟任务未运行时（测试、启动早期）退化为直接读time.monotonic()，
+    语义不变只是少了省syscall的收益。
+    """
+    if _clock_task is None:
+        return time.monotonic()
+    return _cached_monotonic
+
+
+async def _clock_loop() -> None:
+    """后台刷新任务主体"""
+    global _cached_monotonic
+    while True:
+        _cached_monotonic = time.monotonic()
+        await asyncio.sleep(_CLOCK_INTERVAL)
+
+
+def start_clock_cache() -> None:
+    """在当前事件循环上启动时钟刷新任务（幂等）"""
+    global _clock_task, _cached_monotonic
+    if _clock_task is None or _clock_task.done():
+        _cached_monotonic = time.monotonic()
+        _clock_task = asyncio.get_running_loop().create_task(_clock_loop())
+
+
+def stop_clock_cache() -> None:
+    """停止时钟刷新任务"""
+    global _clock_task
+    if _clock_task is not None:
+        _clock_task.cancel()
+        _clock_task = None
@@ -0,0 +1,58 @@
+"""
+向量数据库客户端池 - 复用昂贵的客户端连接
+
+ChromaDB/Qdrant客户端的创建涉及TCP/TLS握手、gRPC通道初始化等开销，
+使用lru_cache缓存单例，避免每次请求重新建立连接
+"""
+from functools import lru_cache
+from app.core.config import settings
+from app.core.logging import logger
+
+
+@lru_cache(maxsize=1)
+def get_chroma_client():
+    """
+    获取ChromaDB客户端（进程级单例）
+
+    Returns:
+        chromadb.PersistentClient实例
+
+    Raises:
+        ImportError: ChromaDB未安装
+    """
+    import chromadb
+
+    logger.info(f"Creating ChromaDB client: {settings.CHROMA_PERSIST_DIR}")
+    try:
+        return chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    except AttributeError:
+        # 旧版本API
+        return chromadb.Client()
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_client():
+    """
+    获取Qdrant客户端（进程级单例，保持gRPC通道持久）
+
+    Returns:
+        QdrantClient实例
+
+    Raises:
+        ImportError: Qdrant客户端未安装
+    """
+    from qdrant_client import QdrantClient
+
+    logger.info(f"Creating Qdrant client: {settings.QDRANT_URL}")
+    return QdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY or None,
+        timeout=10,
+    )
+
+
+def reset_clients() -> None:
+    """重置缓存的客户端（用于测试或重新初始化）"""
+    get_chroma_client.cache_clear()
+    get_qdrant_client.cache_clear()
+    logger.info("Vector store clients reset")
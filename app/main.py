@@ -3,16 +3,17 @@ Enterprise AI Backend - 主入口
 
 生产级RAG后端服务，支持多种LLM、向量数据库和记忆方案
 """
+import asyncio
 from contextlib import asynccontextmanager
-from datetime import datetime
 from typing import Any, Union
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.timeutils import utc_now_iso
 from app.core.exceptions import add_exception_handlers
 from app.core.middleware import (
     RequestIDMiddleware, 
@@ -77,23 +78,32 @@ async def lifespan(app: FastAPI):
         init_settings()
         logger.info("✓ LlamaIndex settings initialized")
         
-        # 3. 初始化向量索引连接
-        try:
-            get_index()
+        # 3. 并发初始化向量索引和Redis连接池：两者互相独立且都是
+        #    I/O密集（向量库预热可达数秒），并发后启动耗时从两者之和
+        #    降为两者的最大值。get_index是同步阻塞调用，丢进线程池
+        vector_res, redis_res = await asyncio.gather(
+            asyncio.to_thread(get_index),
+            RedisConnectionPool.health_check(),
+            return_exceptions=True,
+        )
+        if isinstance(vector_res, BaseException):
+            startup_errors.append(f"Vector store: {vector_res}")
+            logger.error(f"✗ Vector store initialization failed: {vector_res}")
+        else:
             logger.info(f"✓ Vector store initialized ({settings.VECTOR_STORE_PROVIDER})")
-        except Exception as e:
-            startup_errors.append(f"Vector store: {e}")
-            logger.error(f"✗ Vector store initialization failed: {e}")
-        
-        # 4. 初始化 Redis 连接池
-        try:
-            print("DEBUG: Starting Redis health check...")
-            await RedisConnectionPool.health_check()
-
+        if isinstance(redis_res, BaseException):
+            startup_errors.append(f"Redis: {redis_res}")
+            logger.warning(f"⚠ Redis connection check failed: {redis_res}")
+        else:
             logger.info("✓ Redis connection pool initialized")
-        except Exception as e:
-            startup_errors.append(f"Redis: {e}")
-            logger.warning(f"⚠ Redis connection check failed: {e}")
+        
+        # 4. 启动缓存TTL后台清扫、缓存时钟和指标刷新
+        from app.core.cache import start_sweeper
+        from app.core.timeutils import start_clock_cache
+        from app.core.prometheus import start_metrics_flush
+        start_sweeper()
+        start_clock_cache()
+        start_metrics_flush()
         
         logger.info("=" * 60)
         if startup_errors:
@@ -113,6 +123,13 @@ async def lifespan(app: FastAPI):
     # ==================== Shutdown ====================
     logger.info("=" * 60)
     logger.info("Initiating graceful shutdown...")
+
+    from app.core.cache import stop_sweeper
+    from app.core.timeutils import stop_clock_cache
+    from app.core.prometheus import stop_metrics_flush
+    stop_sweeper()
+    stop_clock_cache()
+    stop_metrics_flush()
     
     await shutdown_manager.shutdown()
     
@@ -127,6 +144,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,  # orjson序列化JSON响应（/stats等大payload收益明显）
     lifespan=lifespan
 )
 
@@ -179,45 +197,48 @@ async def health_check(request: Request) -> Union[dict[str, Any], JSONResponse]:
         "status": "ok",
         "service": settings.PROJECT_NAME,
         "version": "1.1.0",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": utc_now_iso(),
         "checks": {}
     }
     
     all_healthy = True
     
-    # 检查向量数据库连接
+    # 向量数据库和Redis互相独立，并发检查
+    vector_res, redis_res = await asyncio.gather(
+        asyncio.to_thread(get_index),
+        RedisConnectionPool.health_check(),
+        return_exceptions=True,
+    )
+    
     vector_store_name = settings.VECTOR_STORE_PROVIDER
-    try:
-        get_index()
+    if isinstance(vector_res, BaseException):
+        all_healthy = False
         health_status["checks"]["vector_store"] = {
-            "status": "healthy",
+            "status": "unhealthy",
             "provider": vector_store_name,
-            "collection": settings.VECTOR_STORE_COLLECTION
+            "error": str(vector_res)
         }
-    except Exception as e:
-        all_healthy = False
+        logger.error(f"Vector store ({vector_store_name}) health check failed: {vector_res}")
+    else:
         health_status["checks"]["vector_store"] = {
-            "status": "unhealthy",
+            "status": "healthy",
             "provider": vector_store_name,
-            "error": str(e)
+            "collection": settings.VECTOR_STORE_COLLECTION
         }
-        logger.error(f"Vector store ({vector_store_name}) health check failed: {e}")
     
-    # 检查 Redis 连接
-    try:
-        redis_healthy = await RedisConnectionPool.health_check()
-        health_status["checks"]["redis"] = {
-            "status": "healthy" if redis_healthy else "unhealthy"
-        }
-        if not redis_healthy:
-            all_healthy = False
-    except Exception as e:
+    if isinstance(redis_res, BaseException):
         all_healthy = False
         health_status["checks"]["redis"] = {
             "status": "unhealthy",
-            "error": str(e)
+            "error": str(redis_res)
         }
-        logger.error(f"Redis health check failed: {e}")
+        logger.error(f"Redis health check failed: {redis_res}")
+    else:
+        health_status["checks"]["redis"] = {
+            "status": "healthy" if redis_res else "unhealthy"
+        }
+        if not redis_res:
+            all_healthy = False
     
     # LLM 配置信息
     health_status["checks"]["llm"] = {
@@ -250,7 +271,7 @@ async def get_metrics() -> dict[str, Any]:
     from app.core.cache import cache
     
     metrics: dict[str, Any] = {
-        "timestamp": datetime.utcnow().isoformat() + "Z"
+        "timestamp": utc_now_iso()
     }
     
     # 请求指标
@@ -265,7 +286,7 @@ async def get_metrics() -> dict[str, Any]:
     # 速率限制指标
     from app.core.rate_limiter import rate_limiter
     metrics["rate_limiter"] = {
-        "active_clients": len(rate_limiter._requests)
+        "active_clients": rate_limiter.active_clients()
     }
     
     return metrics
@@ -284,16 +305,19 @@ async def readiness_check() -> Union[dict[str, str], JSONResponse]:
             content={"status": "not_ready", "reason": "shutting_down"}
         )
     
-    try:
-        # 检查关键组件
-        get_index()
-        await RedisConnectionPool.health_check()
-        return {"status": "ready"}
-    except Exception as e:
-        return JSONResponse(
-            status_code=503,
-            content={"status": "not_ready", "reason": str(e)}
-        )
+    # 关键组件互相独立，并发检查
+    vector_res, redis_res = await asyncio.gather(
+        asyncio.to_thread(get_index),
+        RedisConnectionPool.health_check(),
+        return_exceptions=True,
+    )
+    for result in (vector_res, redis_res):
+        if isinstance(result, BaseException):
+            return JSONResponse(
+                status_code=503,
+                content={"status": "not_ready", "reason": str(result)}
+            )
+    return {"status": "ready"}
 
 
 @app.get("/live")
@@ -314,5 +338,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8080,
         reload=True,
-        log_level="info"
+        log_level="info",
+        loop="uvloop",      # uvloop事件循环（SSE等高并发场景下吞吐提升显著）
+        http="httptools"    # httptools HTTP解析器（比h11快）
     )
@@ -10,7 +10,6 @@ from app.core.retry import retry_with_backoff, RetryConfig
 from app.core.singleton import ThreadSafeSingleton
 from llama_index.core import PromptTemplate
 from llama_index.core.base.response.schema import Response # 引入 Response 类型
-from llama_index.core.memory import ChatMemoryBuffer
 
 
 class ChatService(ThreadSafeSingleton):
@@ -132,38 +131,6 @@ class ChatService(ThreadSafeSingleton):
         return self.index.as_chat_engine(**chat_engine_kwargs)
 
     # --- 修改：chat_stream 使用提取的逻辑 ---
-    @retry_with_backoff(
-        config=RetryConfig(max_retries=2, initial_delay=1.0),
-        exceptions=(ConnectionError, TimeoutError, ValueError)
-    )
-    async def chat_stream(
-        self, 
-        query: str, 
-        session_id: str,
-        llm_provider: Optional[str] = None,
-        llm_model: Optional[str] = None,
-        temperature: Optional[float] = None
-    ) -> AsyncGenerator[str, None]:
-        if not query or not query.strip():
-            raise ValueError("Query cannot be empty")
-        if not session_id or not session_id.strip():
-            raise ValueError("Session ID cannot be empty")
-        
-        try:
-            # 使用提取的方法创建引擎
-            chat_engine = self._create_chat_engine(session_id, llm_provider, llm_model, temperature)
-            
-            # 执行流式推理
-            streaming_response = await chat_engine.astream_chat(query)
-            
-            # 这里的 () 是你之前修复的 bug
-            async for token in streaming_response.async_response_gen():
-                yield token
-                
-        except Exception as e:
-            logger.error(f"Error in chat_stream for session {session_id}: {e}", exc_info=True)
-            raise
-
     @retry_with_backoff(
         config=RetryConfig(max_retries=2, initial_delay=1.0),
         exceptions=(ConnectionError, TimeoutError, ValueError)
@@ -2,6 +2,7 @@ import os
 import shutil
 import tempfile
 from typing import Optional
+import aiofiles
 from fastapi import UploadFile
 from llama_index.core import SimpleDirectoryReader
 from llama_index.core.node_parser import SentenceSplitter
@@ -140,11 +141,13 @@ class IngestService(ThreadSafeSingleton):
         
         try:
             # 1. 保存临时文件 (LlamaIndex Reader 需要文件路径)
+            # 分块异步写入：不经过整文件内存缓冲，也不阻塞事件循环
             os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
+
+            async with aiofiles.open(temp_path, "wb") as buffer:
+                while chunk := await file.read(1 << 20):  # 1MB块
+                    await buffer.write(chunk)
+
             logger.info(f"Saved temporary file: {temp_path}")
             
             # 2. 在线程池中运行耗时的同步任务
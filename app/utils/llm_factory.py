@@ -145,6 +145,9 @@ def reset_index():
     """重置索引（用于测试或重新初始化）"""
     global _index
     _index = None
+    # 同时重置缓存的向量数据库客户端，避免持有失效连接
+    from app.core.vector_clients import reset_clients
+    reset_clients()
     logger.info("Vector Store Index reset")
 
 def create_vector_store_instance(
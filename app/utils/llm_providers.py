@@ -3,6 +3,7 @@ LLM提供商工厂 - 支持OpenAI、Anthropic、vLLM
 
 提供统一的LLM创建接口，支持多种提供商和配置选项
 """
+from functools import lru_cache
 from typing import Optional, Literal, Union
 from llama_index.core.base.llms.types import LLMMetadata
 from llama_index.llms.openai import OpenAI
@@ -221,6 +222,7 @@ class LLMProviderFactory:
         return ["openai", "anthropic", "vllm"]
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_provider_info(provider: str) -> dict:
         """
         获取提供商信息
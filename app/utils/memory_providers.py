@@ -2,6 +2,7 @@
 记忆提供商工厂 - 支持LlamaIndex、LangChain、Mem0
 支持短期记忆（会话内）和长期记忆（跨会话）
 """
+from functools import lru_cache
 from typing import Optional, Literal, Any, Protocol
 from abc import ABC, abstractmethod
 from app.core.config import settings
@@ -189,6 +190,7 @@ class MemoryProviderFactory:
         return ["llamaindex", "langchain", "mem0"]
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_provider_info(provider: str) -> dict:
         """
         获取提供商信息
@@ -1,6 +1,7 @@
 """
 向量数据库提供商工厂 - 支持Milvus、ChromaDB、Pinecone、Qdrant
 """
+from functools import lru_cache
 from typing import Optional, Literal, Any
 from llama_index.core import StorageContext
 from llama_index.core.vector_stores.types import VectorStore
@@ -274,9 +275,10 @@ class VectorStoreProviderFactory:
         return ["milvus", "chroma", "pinecone", "qdrant"]
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_provider_info(provider: str) -> dict:
         """
-        获取提供商信息
+        获取提供商信息（纯字符串函数，lru_cache后重复查询零开销）
         
         Args:
             provider: 提供商名称